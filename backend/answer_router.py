@@ -0,0 +1,124 @@
+"""
+Answer Routing for SwiggyBot
+Decides whether a query can be answered straight from the data context with
+a templated renderer or needs the LLM, and tracks traffic per path
+"""
+
+import re
+import threading
+import time
+from typing import Any, Dict
+
+# Phrases that ask for judgement rather than a number; these always go to the LLM
+ANALYTICAL_PATTERN = re.compile(
+    r"\b(why|should|recommend\w*|suggest\w*|advice|advise|trend\w*|compare\w*|comparison|"
+    r"analy\w+|insight\w*|improve\w*|forecast\w*|predict\w*|strateg\w+|plan\w*|"
+    r"explain\w*|how can|how do|what if|optimi\w+)\b"
+)
+
+PATH_FAST = "fast_path"
+PATH_LLM = "llm"
+PATH_CACHE = "cache"
+PATH_DEMO = "demo"
+# The model failed or its circuit breaker is open; answered by the demo renderer
+PATH_FALLBACK = "fallback"
+
+
+def is_fact_lookup(query: str, context: Dict[str, Any]) -> bool:
+    """True when the context alone fully answers the query"""
+    if ANALYTICAL_PATTERN.search(query.lower()):
+        return False
+    query_type = context.get("query_type")
+    data = context.get("data")
+    if query_type == "inventory":
+        return isinstance(data, dict) and bool(data.get("item_name"))
+    if query_type == "sales":
+        # Totals for an explicit period; open-ended sales questions go to the LLM
+        return isinstance(data, dict) and "start_date" in data
+    if query_type == "low_stock":
+        return isinstance(data, list)
+    return False
+
+
+def render_demo_response(query: str, context: Dict[str, Any]) -> str:
+    """Demo mode: Generate realistic responses based on context"""
+    query_type = context.get("query_type", "general")
+    data = context.get("data", {})
+    
+    if query_type == "inventory":
+        if isinstance(data, dict) and data.get("item_name"):
+            quantity = data['quantity_left']
+            price = data['unit_price']
+            item = data['item_name']
+            status = f"⚠️ Running low (below {data['threshold']})!" if data.get("is_low") else "✅ Stock looks good!"
+            return f"You currently have {quantity} {item.lower()}s left in stock, priced at ₹{price} each. {status}"
+        elif isinstance(data, list):
+            items = [f"{item['item_name']}: {item['quantity_left']} units" for item in data]
+            return f"📦 **Inventory Overview:**\n" + "\n".join(items)
+        return "I couldn't find specific inventory details for that query."
+    
+    elif query_type == "sales":
+        if "invalid_date" in data:
+            return (f"🤔 I couldn't work out the dates in that question ({data['invalid_date']}). "
+                    "Try something like \"Sept 1 to 15\" or \"last 7 days\".")
+        if "start_date" in data:
+            period = data.get("date") or f"{data['start_date']} to {data['end_date']}"
+            total_profit = data.get("total_profit", 0)
+            sales_count = data.get("transactions", 0)
+            report = f"📊 **Sales Report for {period}:**\n💰 Total Profit: ₹{total_profit:,}\n📈 Number of transactions: {sales_count}"
+            top_items = data.get("items", [])[:3]
+            if top_items:
+                report += "\n🏆 Top items: " + ", ".join(f"{item['item_name']} ({item['total_sold']} sold)" for item in top_items)
+            return report
+        else:
+            total_profit = data.get("total_profit", 0)
+            return f"💰 **All-time total profit:** ₹{total_profit:,}\n🎯 Great job managing your restaurant!"
+    
+    elif query_type == "low_stock":
+        if isinstance(data, list) and data:
+            low_items = [f"• {item['item_name']}: Only {item['quantity_left']} left" for item in data]
+            return f"⚠️ **Low Stock Alert:**\n" + "\n".join(low_items) + "\n\n💡 Consider restocking these items soon!"
+        return "✅ All items are well-stocked! No items are running low."
+    
+    elif query_type == "top_selling":
+        if isinstance(data, list) and data:
+            top_items = [f"{i+1}. {item['item_name']}: {item['total_sold']} sold (₹{item['total_profit']} profit)" for i, item in enumerate(data[:5])]
+            return f"🏆 **Top Selling Items:**\n" + "\n".join(top_items)
+        return "📊 No sales data available yet to determine top-selling items."
+    
+    elif query_type == "overview":
+        inventory_count = len(data.get("inventory", []))
+        recent_sales = len(data.get("recent_sales", []))
+        total_profit = data.get("total_profit", 0)
+        return f"🏪 **Restaurant Overview:**\n📦 Inventory Items: {inventory_count}\n📊 Today's Sales: {recent_sales} transactions\n💰 All-time Profit: ₹{total_profit:,}\n\n🤖 *Demo Mode Active - Get your Gemini API key for smarter responses!*"
+    
+    return "🤖 I'm running in demo mode! Ask me about inventory, sales, profits, or low stock items.\n\n💡 *Get a Gemini API key for more intelligent responses!*"
+
+
+class RouteStats:
+    """Request count and cumulative latency per answer path"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._seconds: Dict[str, float] = {}
+
+    def record(self, path: str, started_at: float) -> None:
+        elapsed = time.perf_counter() - started_at
+        with self._lock:
+            self._counts[path] = self._counts.get(path, 0) + 1
+            self._seconds[path] = self._seconds.get(path, 0.0) + elapsed
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self._counts.values())
+        return {
+            "total_requests": total,
+            "paths": {
+                path: {
+                    "requests": count,
+                    "share": round(count / total, 4),
+                    "avg_latency_ms": round(self._seconds[path] / count * 1000, 3),
+                }
+                for path, count in self._counts.items()
+            },
+        }
@@ -0,0 +1,244 @@
+"""
+Date Range Parsing for SwiggyBot
+Turns phrases like "today", "last week", "past 10 days", "2025-09-01 to
+2025-09-05", "between Sept 1 and 15", "since Sept 1" or "in March 2024"
+into an inclusive date range, resolved against the business date rather
+than the wall clock
+"""
+
+import re
+from datetime import date, timedelta
+from typing import Optional, Tuple, Union
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3,
+    "apr": 4, "april": 4, "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7,
+    "aug": 8, "august": 8, "sep": 9, "sept": 9, "september": 9, "oct": 10, "october": 10,
+    "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+
+_MONTH = r"(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?"
+_ISO = r"(\d{4}-\d{2}-\d{2})"
+_TO = r"\s*(?:to|and|through|till|until|-|–)\s*"
+_YEAR_NUMBER = r"((?:19|20)\d{2})\b"
+# Optional explicit year after a date: "sept 1 2024", "march, 2024"
+_YEAR = r"(?:,?\s+" + _YEAR_NUMBER + r")?"
+
+ISO_RANGE = re.compile(_ISO + _TO + _ISO)
+# "sept 1 and 15", "sep 1 to oct 3", "sept 1-15 2024"
+MONTH_DAY_RANGE = re.compile(
+    r"\b" + _MONTH + r"\s+" + _DAY + _TO + r"(?:" + _MONTH + r"\s+)?" + _DAY + r"\b" + _YEAR
+)
+# "1 to 15 sept", "1st sep - 3rd oct 2024"
+DAY_MONTH_RANGE = re.compile(
+    r"\b" + _DAY + r"(?:\s+" + _MONTH + r")?" + _TO + _DAY + r"\s+" + _MONTH + r"(?!\w)" + _YEAR
+)
+ISO_DATE = re.compile(_ISO)
+MONTH_DAY = re.compile(r"\b" + _MONTH + r"\s+" + _DAY + r"\b" + _YEAR)
+DAY_MONTH = re.compile(r"\b" + _DAY + r"\s+(?:of\s+)?" + _MONTH + r"(?!\w)" + _YEAR)
+# "in sept", "for march 2024"; a month with a year needs no preposition ("sep 2024")
+WHOLE_MONTH = re.compile(r"\b(?:in|during|for|of)\s+" + _MONTH + r"(?!\w)" + _YEAR)
+MONTH_YEAR = re.compile(r"\b" + _MONTH + r",?\s+" + _YEAR_NUMBER)
+WHOLE_YEAR = re.compile(r"\b(?:in|during|for|of)\s+" + _YEAR_NUMBER)
+# "since sept 1", "from 2025-09-01": open range up to today, when a date follows directly
+SINCE = re.compile(r"\b(?:since|from)\s+")
+MONTH_ONLY = re.compile(_MONTH + r"(?!\w)" + _YEAR)
+LAST_N = re.compile(r"\b(?:last|past|previous)\s+(\d{1,3})\s+(day|week|month)s?\b")
+
+
+class DateRange:
+    """Inclusive date range with a human-readable label"""
+
+    __slots__ = ("start", "end", "label")
+
+    def __init__(self, start: date, end: date, label: str):
+        self.start = start
+        self.end = end
+        self.label = label
+
+    @property
+    def single_day(self) -> bool:
+        return self.start == self.end
+
+    def __repr__(self) -> str:
+        return f"DateRange({self.start.isoformat()}, {self.end.isoformat()}, {self.label!r})"
+
+
+class InvalidDate:
+    """A date phrase that names no real dates ("sept 31", "feb 29 2025", "last 0 days")"""
+
+    __slots__ = ("reason",)
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, InvalidDate) and other.reason == self.reason
+
+    def __hash__(self) -> int:
+        return hash(self.reason)
+
+    def __repr__(self) -> str:
+        return f"InvalidDate({self.reason!r})"
+
+
+def _month_start(day: date, months_back: int = 0) -> date:
+    month_index = day.year * 12 + day.month - 1 - months_back
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _month_end(day: date) -> date:
+    return _month_start(day, -1) - timedelta(days=1)
+
+
+def _on_or_before(month: int, day: int, today: date, year: Optional[str] = None) -> date:
+    """The date in `year` when given, else in the latest year that does not put it after today"""
+    if year:
+        return date(int(year), month, day)
+    resolved = date(today.year, month, day)
+    if resolved > today:
+        resolved = date(today.year - 1, month, day)
+    return resolved
+
+
+def _span(start: date, end: date, label: str) -> DateRange:
+    if end < start:
+        start, end = end, start
+    return DateRange(start, end, label)
+
+
+def _date_at_start(text: str, today: date) -> Optional[Tuple[date, str]]:
+    """(date, matched text) for a date or month at the very start of text; a month means its first day"""
+    match = ISO_DATE.match(text)
+    if match:
+        return date.fromisoformat(match.group(1)), match.group(0)
+    match = MONTH_DAY.match(text)
+    if match:
+        return _on_or_before(MONTHS[match.group(1)], int(match.group(2)), today, match.group(3)), match.group(0)
+    match = DAY_MONTH.match(text)
+    if match:
+        return _on_or_before(MONTHS[match.group(2)], int(match.group(1)), today, match.group(3)), match.group(0)
+    match = MONTH_ONLY.match(text)
+    if match:
+        return _on_or_before(MONTHS[match.group(1)], 1, today, match.group(2)), match.group(0)
+    return None
+
+
+def _range_with_year(start_month: int, start_day: int, end_month: int, end_day: int,
+                     today: date, year: Optional[str]) -> Tuple[date, date]:
+    """Start and end of a day-month range; a range across New Year starts in the year before"""
+    if year:
+        end = date(int(year), end_month, end_day)
+        return date(end.year - (end_month < start_month), start_month, start_day), end
+    start = _on_or_before(start_month, start_day, today)
+    return start, date(start.year + (end_month < start_month), end_month, end_day)
+
+
+def _whole_month(month: int, today: date, year: Optional[str], label: str) -> DateRange:
+    start = date(int(year) if year else today.year if month <= today.month else today.year - 1, month, 1)
+    end = _month_end(start)
+    return DateRange(start, today if start <= today < end else end, label)
+
+
+def parse_date_range(query: str, today: date) -> Optional[Union[DateRange, InvalidDate]]:
+    """Date range mentioned in a query, None when it names none, or InvalidDate
+    when it names dates that do not exist"""
+    text = query.lower()
+    try:
+        return _parse(text, today)
+    except ValueError as e:
+        # e.g. "sept 31"; answering for all time instead would be silently wrong
+        return InvalidDate(str(e))
+
+
+def _parse(text: str, today: date) -> Optional[DateRange]:
+    match = ISO_RANGE.search(text)
+    if match:
+        start, end = date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2))
+        return _span(start, end, f"{match.group(1)} to {match.group(2)}")
+
+    match = MONTH_DAY_RANGE.search(text)
+    if match:
+        start_month = MONTHS[match.group(1)]
+        end_month = MONTHS[match.group(3)] if match.group(3) else start_month
+        start, end = _range_with_year(start_month, int(match.group(2)), end_month, int(match.group(4)),
+                                      today, match.group(5))
+        return _span(start, end, match.group(0))
+
+    match = DAY_MONTH_RANGE.search(text)
+    if match:
+        end_month = MONTHS[match.group(4)]
+        start_month = MONTHS[match.group(2)] if match.group(2) else end_month
+        start, end = _range_with_year(start_month, int(match.group(1)), end_month, int(match.group(3)),
+                                      today, match.group(5))
+        return _span(start, end, match.group(0))
+
+    for match in SINCE.finditer(text):
+        anchor = _date_at_start(text[match.end():], today)
+        if anchor:
+            return _span(anchor[0], today, match.group(0) + anchor[1])
+
+    match = LAST_N.search(text)
+    if match:
+        count, unit = int(match.group(1)), match.group(2)
+        if count < 1:
+            raise ValueError(f"'{match.group(0)}' is an empty range")
+        if unit == "day":
+            start = today - timedelta(days=count - 1)
+        elif unit == "week":
+            start = today - timedelta(days=7 * count - 1)
+        else:
+            start = _month_start(today, count - 1)
+        return _span(start, today, match.group(0))
+
+    if "day before yesterday" in text:
+        day = today - timedelta(days=2)
+        return DateRange(day, day, "day before yesterday")
+    if "yesterday" in text:
+        day = today - timedelta(days=1)
+        return DateRange(day, day, "yesterday")
+    if re.search(r"\b(?:this|current) week\b", text) or "week to date" in text:
+        return DateRange(today - timedelta(days=today.weekday()), today, "this week")
+    if re.search(r"\b(?:last|previous|past) week\b", text):
+        # Monday to Sunday of the previous calendar week
+        start = today - timedelta(days=today.weekday() + 7)
+        return DateRange(start, start + timedelta(days=6), "last week")
+    if re.search(r"\b(?:this|current) month\b", text) or "month to date" in text:
+        return DateRange(_month_start(today), today, "this month")
+    if re.search(r"\b(?:last|previous|past) month\b", text):
+        start = _month_start(today, 1)
+        return DateRange(start, _month_end(start), "last month")
+    if re.search(r"\b(?:this|current) year\b", text) or "year to date" in text:
+        return DateRange(date(today.year, 1, 1), today, "this year")
+    if re.search(r"\b(?:last|previous|past) year\b", text):
+        return DateRange(date(today.year - 1, 1, 1), date(today.year - 1, 12, 31), "last year")
+
+    match = ISO_DATE.search(text)
+    if match:
+        day = date.fromisoformat(match.group(1))
+        return DateRange(day, day, match.group(1))
+    match = MONTH_DAY.search(text)
+    if match:
+        day = _on_or_before(MONTHS[match.group(1)], int(match.group(2)), today, match.group(3))
+        return DateRange(day, day, match.group(0))
+    match = DAY_MONTH.search(text)
+    if match:
+        day = _on_or_before(MONTHS[match.group(2)], int(match.group(1)), today, match.group(3))
+        return DateRange(day, day, match.group(0))
+    match = MONTH_YEAR.search(text)
+    if match:
+        return _whole_month(MONTHS[match.group(1)], today, match.group(2), match.group(0))
+    if re.search(r"\b(?:today|tonight)\b", text):
+        return DateRange(today, today, "today")
+
+    match = WHOLE_MONTH.search(text)
+    if match:
+        label = match.group(1) + (" " + match.group(2) if match.group(2) else "")
+        return _whole_month(MONTHS[match.group(1)], today, match.group(2), label)
+    match = WHOLE_YEAR.search(text)
+    if match:
+        start = date(int(match.group(1)), 1, 1)
+        end = date(start.year, 12, 31)
+        return DateRange(start, today if start <= today < end else end, match.group(1))
+    return None
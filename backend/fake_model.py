@@ -0,0 +1,101 @@
+"""
+Fake Gemini Model for SwiggyBot
+Local stand-in for genai.GenerativeModel with injectable latency and
+failures, used by tests and benchmarks so the LLM path can be exercised offline
+"""
+
+import asyncio
+import random
+import re
+import time
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+
+class FakeModelError(Exception):
+    """Injected upstream failure"""
+
+
+class FakeResponse:
+    """Mimics the `.text` attribute of a Gemini response"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Drop-in replacement for genai.GenerativeModel
+
+    `latency` is the simulated round trip in seconds (time to first chunk
+    when streaming) and `chunk_latency` the delay between streamed chunks.
+    `reply` builds the response text from the prompt; by default the prompt
+    size is echoed.
+
+    Faults: the first `fail_first` calls, then a `failure_rate` share of
+    calls, raise FakeModelError after their latency; a `slow_rate` share of
+    calls take `slow_latency` instead of `latency`. `seed` makes the random
+    faults repeatable.
+    """
+
+    def __init__(self, latency: float = 0.0, reply: Optional[Callable[[str], str]] = None,
+                 chunk_latency: float = 0.0, fail_first: int = 0, failure_rate: float = 0.0,
+                 slow_rate: float = 0.0, slow_latency: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.reply = reply or (lambda prompt: f"Fake response for prompt of {len(prompt)} chars")
+        self.fail_first = fail_first
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def _next_call(self) -> Tuple[float, bool]:
+        """Count a call and decide its (latency, fails)"""
+        self.calls += 1
+        fails = self.calls <= self.fail_first or self._random.random() < self.failure_rate
+        slow = self._random.random() < self.slow_rate
+        if fails:
+            self.failures += 1
+        return (self.slow_latency if slow else self.latency), fails
+
+    def _chunks(self, prompt: str) -> List[str]:
+        return re.findall(r"\S+\s*", self.reply(prompt)) or [""]
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        latency, fails = self._next_call()
+        if stream:
+            return self._stream(prompt, latency, fails)
+        if latency:
+            time.sleep(latency)
+        if fails:
+            raise FakeModelError("Injected model failure")
+        return FakeResponse(self.reply(prompt))
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        latency, fails = self._next_call()
+        if stream:
+            return self._astream(prompt, latency, fails)
+        if latency:
+            await asyncio.sleep(latency)
+        if fails:
+            raise FakeModelError("Injected model failure")
+        return FakeResponse(self.reply(prompt))
+
+    def _stream(self, prompt: str, latency: float, fails: bool) -> Iterator[FakeResponse]:
+        time.sleep(latency)
+        if fails:
+            raise FakeModelError("Injected model failure")
+        for i, chunk in enumerate(self._chunks(prompt)):
+            if i and self.chunk_latency:
+                time.sleep(self.chunk_latency)
+            yield FakeResponse(chunk)
+
+    async def _astream(self, prompt: str, latency: float, fails: bool) -> AsyncIterator[FakeResponse]:
+        await asyncio.sleep(latency)
+        if fails:
+            raise FakeModelError("Injected model failure")
+        for i, chunk in enumerate(self._chunks(prompt)):
+            if i and self.chunk_latency:
+                await asyncio.sleep(self.chunk_latency)
+            yield FakeResponse(chunk)
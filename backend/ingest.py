@@ -0,0 +1,144 @@
+"""
+Bulk Ingestion for SwiggyBot
+Streams CSV or JSONL uploads row by row and writes them to the repository
+in fixed-size chunks, so large files never have to fit in memory
+"""
+
+import csv
+import io
+import json
+import logging
+import time
+from datetime import date
+from itertools import islice
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from repository import Repository, RowError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+# A chunk is one SQLite write transaction; larger ones would stall other writers
+MAX_CHUNK_SIZE = 10000
+MAX_REPORTED_ERRORS = 100
+
+# Parsed row, or the reason it could not be parsed
+ParsedRow = Tuple[Optional[Dict[str, Any]], Optional[str]]
+
+
+def _parse_sale(raw: Dict[str, Any], default_date: str) -> Dict[str, Any]:
+    profit = raw.get("total_profit")
+    return {
+        # Only ISO dates; anything else would sort wrongly and skew "today"
+        "date": date.fromisoformat(str(raw.get("date") or default_date)).isoformat(),
+        "item_name": str(raw["item_name"]).strip(),
+        "quantity_sold": int(raw["quantity_sold"]),
+        "total_profit": float(profit) if profit not in (None, "") else None,
+    }
+
+
+def _parse_item(raw: Dict[str, Any], default_date: str) -> Dict[str, Any]:
+    return {
+        "item_name": str(raw["item_name"]).strip(),
+        "quantity_left": int(raw["quantity_left"]),
+        "unit_price": float(raw["unit_price"]),
+    }
+
+
+def iter_records(stream: BinaryIO, file_format: str) -> Iterator[ParsedRow]:
+    """Lazily decode CSV (with header) or JSON Lines records from a binary stream"""
+    if file_format not in ("csv", "jsonl"):
+        raise ValueError(f"Unsupported import format '{file_format}'")
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    try:
+        if file_format == "csv":
+            try:
+                for record in csv.DictReader(text):
+                    yield record, None
+            except csv.Error as e:
+                yield None, f"Unreadable CSV, import stopped: {e}"
+        else:
+            for line in text:
+                if not line.strip():
+                    continue
+                # A malformed line only rejects that line
+                try:
+                    yield json.loads(line), None
+                except ValueError as e:
+                    yield None, f"Unreadable record: {e}"
+    finally:
+        # Leave the underlying upload open for its owner to close
+        text.detach()
+
+
+def detect_format(filename: Optional[str], requested: Optional[str] = None) -> str:
+    if requested:
+        return requested.lower()
+    if filename and filename.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+def _parsed(records: Iterator[ParsedRow], parse: Callable, default_date: str) -> Iterator[ParsedRow]:
+    for raw, problem in records:
+        if raw is None:
+            yield None, problem
+            continue
+        try:
+            yield parse(raw, default_date), None
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            yield None, f"Invalid record: {e!r}"
+
+
+def _import(stream: BinaryIO, file_format: str, parse: Callable,
+            write: Callable[[List[Dict[str, Any]]], List[RowError]],
+            chunk_size: int, default_date: str) -> Dict[str, Any]:
+    started_at = time.perf_counter()
+    total = accepted = 0
+    errors: List[Dict[str, Any]] = []
+    error_count = 0
+    rows = _parsed(iter_records(stream, file_format), parse, default_date)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        valid, positions = [], []
+        for offset, (row, problem) in enumerate(chunk):
+            if row is None:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"row": total + offset + 1, "error": problem})
+            else:
+                valid.append(row)
+                positions.append(total + offset + 1)
+        for index, problem in write(valid) if valid else []:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": positions[index], "error": problem})
+        total += len(chunk)
+        accepted = total - error_count
+
+    seconds = time.perf_counter() - started_at
+    rows_per_second = round(total / seconds) if seconds > 0 else total
+    logger.info(f"[IMPORT] {total} rows ({accepted} accepted) in {seconds:.2f}s = {rows_per_second} rows/s")
+    return {
+        "rows": total,
+        "accepted": accepted,
+        "rejected": error_count,
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "rows_per_second": rows_per_second,
+    }
+
+
+def import_sales(repository: Repository, stream: BinaryIO, file_format: str = "csv",
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, default_date: str = "") -> Dict[str, Any]:
+    """Record every sale in the stream, decrementing stock; rows without a date use default_date"""
+    return _import(stream, file_format, _parse_sale, repository.record_sales_bulk, chunk_size, default_date)
+
+
+def import_inventory(repository: Repository, stream: BinaryIO, file_format: str = "csv",
+                     chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    """Insert or replace every inventory item in the stream"""
+    return _import(stream, file_format, _parse_item, repository.upsert_items_bulk, chunk_size, "")
@@ -0,0 +1,184 @@
+"""
+Intent and Entity Matcher for SwiggyBot
+Compiles the intent keyword tables and the menu catalog into one Aho-Corasick
+automaton so a query is classified in a single pass, with a trigram index
+for misspelled item names
+"""
+
+import logging
+import re
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"${text}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class QueryMatch:
+    """Result of matching one query"""
+
+    __slots__ = ("intent", "item_name", "keywords", "fuzzy")
+
+    def __init__(self, intent: str, item_name: Optional[str], keywords: Set[str], fuzzy: bool = False):
+        self.intent = intent
+        self.item_name = item_name
+        self.keywords = keywords
+        self.fuzzy = fuzzy
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher over lowercase text"""
+
+    def __init__(self, patterns: Iterable[Tuple[str, Tuple[str, str]]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, str]]] = [[]]
+
+        for text, label in patterns:
+            state = 0
+            for char in text:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(label)
+
+        # Breadth-first pass to wire failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> Set[Tuple[str, str]]:
+        """Labels of every pattern occurring in text"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found: Set[Tuple[str, str]] = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class IntentMatcher:
+    """Single-pass intent detection and item extraction
+
+    `intents` maps intent name to trigger keywords; earlier intents win when
+    several match. Item names are matched as substrings like the keywords,
+    and misspellings fall back to a trigram index over the catalog.
+    """
+
+    def __init__(self, intents: Dict[str, List[str]], default_intent: str = "overview",
+                 item_intents: Iterable[str] = ("inventory",), fuzzy_threshold: float = 0.5):
+        self.intents = intents
+        self.default_intent = default_intent
+        self.item_intents = set(item_intents)
+        self.fuzzy_threshold = fuzzy_threshold
+        self._intent_rank = {intent: rank for rank, intent in enumerate(intents)}
+        self._catalog: List[str] = []
+        self._catalog_keys: Set[str] = set()
+        self._item_rank: Dict[str, int] = {}
+        self._trigram_index: Dict[str, Set[str]] = {}
+        self._trigram_counts: Dict[str, int] = {}
+        self._keyword_intents: Dict[str, List[str]] = {}
+        for intent, keywords in intents.items():
+            for keyword in keywords:
+                self._keyword_intents.setdefault(keyword.lower(), []).append(intent)
+        self._automaton: Optional[AhoCorasick] = None
+        self._lock = threading.Lock()
+
+    def set_catalog(self, item_names: Iterable[str]) -> None:
+        """Replace the menu catalog; the automaton is rebuilt on next use"""
+        with self._lock:
+            self._catalog = list(item_names)
+            self._catalog_keys = {name.lower() for name in self._catalog}
+            self._automaton = None
+
+    def add_item(self, item_name: str) -> None:
+        """Add a menu item if it is not already known"""
+        if item_name.lower() in self._catalog_keys:
+            return
+        with self._lock:
+            self._catalog.append(item_name)
+            self._catalog_keys.add(item_name.lower())
+            self._automaton = None
+
+    def _build(self) -> AhoCorasick:
+        with self._lock:
+            if self._automaton is not None:
+                return self._automaton
+            patterns = [(keyword, ("keyword", keyword)) for keyword in self._keyword_intents]
+            patterns += [(name.lower(), ("item", name)) for name in self._catalog]
+            self._item_rank = {name: rank for rank, name in enumerate(self._catalog)}
+            trigram_index: Dict[str, Set[str]] = {}
+            trigram_counts: Dict[str, int] = {}
+            for name in self._catalog:
+                grams = _trigrams(name.lower())
+                trigram_counts[name] = len(grams)
+                for gram in grams:
+                    trigram_index.setdefault(gram, set()).add(name)
+            self._trigram_index = trigram_index
+            self._trigram_counts = trigram_counts
+            self._automaton = AhoCorasick(patterns)
+            logger.info(f"Built intent matcher with {len(patterns)} patterns")
+            return self._automaton
+
+    def match(self, query: str) -> QueryMatch:
+        """Classify a query and extract the menu item it mentions"""
+        automaton = self._automaton or self._build()
+        query_lower = query.lower()
+        found = automaton.find(query_lower)
+
+        keywords = {value for kind, value in found if kind == "keyword"}
+        intents = [intent for keyword in keywords for intent in self._keyword_intents[keyword]]
+        intent = min(intents, key=self._intent_rank.__getitem__) if intents else self.default_intent
+
+        items = [value for kind, value in found if kind == "item"]
+        if items:
+            # Catalog order decides between several mentioned items
+            return QueryMatch(intent, min(items, key=self._item_rank.__getitem__), keywords)
+        if intent in self.item_intents:
+            fuzzy_item = self._fuzzy_item(query_lower)
+            if fuzzy_item:
+                return QueryMatch(intent, fuzzy_item, keywords, fuzzy=True)
+        return QueryMatch(intent, None, keywords)
+
+    def _fuzzy_item(self, query_lower: str) -> Optional[str]:
+        """Best catalog item by trigram Dice similarity against query words"""
+        best_name, best_score = None, self.fuzzy_threshold
+        words = _WORD.findall(query_lower)
+        # Compare single words and adjacent pairs to cover two-word item names
+        candidates = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in candidates:
+            if len(word) < 3:
+                continue
+            grams = _trigrams(word)
+            overlap: Dict[str, int] = {}
+            for gram in grams:
+                for name in self._trigram_index.get(gram, ()):
+                    overlap[name] = overlap.get(name, 0) + 1
+            for name, shared in overlap.items():
+                score = 2 * shared / (len(grams) + self._trigram_counts[name])
+                if score > best_score:
+                    best_name, best_score = name, score
+        return best_name
@@ -0,0 +1,276 @@
+"""
+Async LLM Client for SwiggyBot
+Runs Gemini calls without blocking the event loop, with a concurrency limit,
+deadline-aware retries, optional hedged requests, a circuit breaker and
+cancellation when the HTTP client goes away
+"""
+
+import asyncio
+import functools
+import os
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional
+
+from resilience import CircuitBreaker, LatencyWindow, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "10"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.2"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "2"))
+# Send a second request when the first is slower than this latency percentile; 0 disables hedging
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+
+class LLMTimeoutError(Exception):
+    """Raised when a model call exceeds its deadline"""
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while its circuit breaker is open"""
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the HTTP client disconnects before the response is ready"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed call may succeed if sent again
+
+    A safety-blocked response raises ValueError on `.text`, and 4xx API errors
+    (bad request, auth, permission) fail the same way every time; neither says
+    anything about the upstream's health. Timeouts (408) and rate limits (429)
+    are transient.
+    """
+    if isinstance(error, ValueError):
+        return False
+    # google.api_core errors carry the HTTP status as `code`
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and 400 <= code < 500:
+        return code in (408, 429)
+    return True
+
+
+class AsyncLLMClient:
+    """Non-blocking wrapper around a Gemini model
+
+    Uses the SDK's `generate_content_async` when available and otherwise
+    runs `generate_content` on a dedicated thread pool, so the event loop
+    keeps serving other requests while a call is in flight.
+
+    `generate` retries failed or slow attempts with jittered backoff as long
+    as the overall deadline allows (errors that `is_retryable` rejects are
+    raised at once and not counted by the breaker), can hedge an attempt that runs past the
+    `hedge_percentile` latency with a second one, and refuses to call at all
+    (CircuitOpenError) while the breaker is open.
+    """
+
+    def __init__(self, model: Any, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 timeout: float = LLM_TIMEOUT_SECONDS, attempt_timeout: float = LLM_ATTEMPT_TIMEOUT_SECONDS,
+                 max_attempts: int = LLM_MAX_ATTEMPTS, backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = LLM_BACKOFF_MAX_SECONDS, hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker or CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+        self.latency = LatencyWindow()
+        self.in_flight = 0
+        self.attempts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+        self.non_retryable = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if not hasattr(model, "generate_content_async"):
+            self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Generate text for a prompt, waiting at most `timeout` seconds in total,
+        including queueing, retries and backoff"""
+        deadline = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + deadline
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise CircuitOpenError("Model circuit breaker is open")
+            attempt += 1
+            self.attempts += 1
+            limit = min(expires_at - loop.time(), self.attempt_timeout)
+            try:
+                text = await asyncio.wait_for(self._generate_hedged(prompt), limit)
+            except asyncio.TimeoutError:
+                error: Exception = LLMTimeoutError(f"Model call timed out after {limit:.1f}s")
+            except Exception as e:
+                error = e
+            else:
+                self.breaker.record_success()
+                return text
+            if not is_retryable(error):
+                self.non_retryable += 1
+                raise error
+            self.breaker.record_failure()
+
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+            if attempt >= self.max_attempts or loop.time() + delay >= expires_at:
+                raise error
+            self.retries += 1
+            logger.warning(f"[GEMINI] Attempt {attempt} failed ({error}), retrying in {delay * 1000:.0f}ms")
+            await asyncio.sleep(delay)
+
+    async def _generate_hedged(self, prompt: str) -> str:
+        """One attempt, plus a second request if the first runs past the hedge percentile"""
+        hedge_after = self.latency.percentile(self.hedge_percentile) if self.hedge_percentile else None
+        if hedge_after is None:
+            return await self._generate_limited(prompt)
+
+        primary = asyncio.ensure_future(self._generate_limited(prompt))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+            if done:
+                return primary.result()
+            self.hedges += 1
+            logger.info(f"[GEMINI] No response after {hedge_after * 1000:.0f}ms (p{self.hedge_percentile:g}), sending hedge request")
+            hedge = asyncio.ensure_future(self._generate_limited(prompt))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Both failed; report the original request's error
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _generate_limited(self, prompt: str) -> str:
+        async with self._semaphore:
+            self.in_flight += 1
+            started_at = time.perf_counter()
+            try:
+                response = await self._call_model(prompt)
+            finally:
+                self.in_flight -= 1
+        self.latency.record(time.perf_counter() - started_at)
+        return getattr(response, 'text', '') or ''
+
+    async def stream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield text deltas as they are generated, within the same deadline as `generate`"""
+        deadline = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + deadline
+        # Streams are not retried (chunks may already be out), but they feed the breaker
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError("Model circuit breaker is open")
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), deadline)
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"Model call timed out after {deadline:.1f}s")
+
+        self.in_flight += 1
+        chunks = self._stream_model(prompt)
+        try:
+            while True:
+                remaining = expires_at - loop.time()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    text = await asyncio.wait_for(chunks.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    self.breaker.record_failure()
+                    raise LLMTimeoutError(f"Model stream timed out after {deadline:.1f}s")
+                except Exception as e:
+                    if is_retryable(e):
+                        self.breaker.record_failure()
+                    raise
+                if text:
+                    yield text
+            self.breaker.record_success()
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            try:
+                await chunks.aclose()
+            except RuntimeError:
+                pass
+
+    async def _stream_model(self, prompt: str) -> AsyncIterator[str]:
+        if self._executor is None:
+            response = await self.model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                yield getattr(chunk, 'text', '') or ''
+            return
+
+        # Pull each chunk of the synchronous stream on the executor
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self._executor, functools.partial(self.model.generate_content, prompt, stream=True)
+        )
+        iterator = iter(response)
+        done = object()
+        while True:
+            chunk = await loop.run_in_executor(self._executor, next, iterator, done)
+            if chunk is done:
+                break
+            yield getattr(chunk, 'text', '') or ''
+
+    def stats(self) -> Dict[str, Any]:
+        hedge_after = self.latency.percentile(self.hedge_percentile) if self.hedge_percentile else None
+        return {
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_after_ms": None if hedge_after is None else round(hedge_after * 1000, 1),
+            "rejected_by_breaker": self.rejected,
+            "non_retryable_errors": self.non_retryable,
+            "breaker": self.breaker.stats(),
+        }
+
+    async def _call_model(self, prompt: str) -> Any:
+        if self._executor is None:
+            return await self.model.generate_content_async(prompt)
+        # Executor threads cannot be interrupted; a timed-out call finishes in the background
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.model.generate_content, prompt)
+
+
+async def run_until_disconnected(http_request: Any, awaitable: Awaitable, poll_interval: float = 0.25) -> Any:
+    """Await `awaitable`, cancelling it if the HTTP client disconnects first"""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                logger.info("[GEMINI] Client disconnected, cancelled in-flight request")
+                raise ClientDisconnectedError()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,167 @@
+"""
+Low-Stock Alerts for SwiggyBot
+Per-item reorder thresholds kept in an index ordered by stock headroom
+(quantity_left - threshold), so every stock change is placed and checked
+for a threshold crossing in O(log n), and crossings are pushed to
+subscribers instead of being found by polling
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from repository import InventoryItem, normalize_item_name
+
+logger = logging.getLogger(__name__)
+
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", "10"))
+ALERT_QUEUE_SIZE = 100
+
+ALERT_LOW = "low_stock"
+ALERT_RESTOCKED = "restocked"
+
+
+class StockLevel:
+    """An item's stock and its reorder threshold"""
+
+    __slots__ = ("item_name", "quantity_left", "unit_price", "threshold")
+
+    def __init__(self, item_name: str, quantity_left: int, unit_price: float, threshold: int):
+        self.item_name = item_name
+        self.quantity_left = quantity_left
+        self.unit_price = unit_price
+        self.threshold = threshold
+
+    @property
+    def headroom(self) -> int:
+        return self.quantity_left - self.threshold
+
+    @property
+    def is_low(self) -> bool:
+        return self.quantity_left < self.threshold
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "item_name": self.item_name,
+            "quantity_left": self.quantity_left,
+            "unit_price": self.unit_price,
+            "threshold": self.threshold,
+        }
+
+
+class LowStockIndex:
+    """Items ordered by headroom; the low ones are the prefix with headroom < 0"""
+
+    def __init__(self, default_threshold: int = LOW_STOCK_THRESHOLD):
+        self.default_threshold = default_threshold
+        self._thresholds: Dict[str, int] = {}
+        self._levels: Dict[str, StockLevel] = {}
+        self._order: List[Tuple[int, str]] = []
+        self._lock = threading.Lock()
+
+    def load(self, items: List[InventoryItem], thresholds: Optional[Dict[str, int]] = None) -> None:
+        """Replace the indexed stock (and thresholds, when given) without raising alerts"""
+        with self._lock:
+            if thresholds is not None:
+                self._thresholds = dict(thresholds)
+            levels = {}
+            for item in items:
+                key = normalize_item_name(item.item_name)
+                threshold = self._thresholds.get(key, self.default_threshold)
+                levels[key] = StockLevel(item.item_name, item.quantity_left, item.unit_price, threshold)
+            self._levels = levels
+            self._order = sorted((level.headroom, key) for key, level in levels.items())
+
+    def update(self, item: InventoryItem) -> Optional[Dict[str, Any]]:
+        """Record an item's new stock; returns an alert if it crossed its threshold"""
+        key = normalize_item_name(item.item_name)
+        with self._lock:
+            threshold = self._thresholds.get(key, self.default_threshold)
+            return self._place(key, StockLevel(item.item_name, item.quantity_left, item.unit_price, threshold))
+
+    def set_threshold(self, item_name: str, threshold: int) -> Optional[Dict[str, Any]]:
+        """Change an item's threshold; returns an alert if that makes it cross"""
+        key = normalize_item_name(item_name)
+        with self._lock:
+            self._thresholds[key] = threshold
+            level = self._levels.get(key)
+            if level is None:
+                return None
+            return self._place(key, StockLevel(level.item_name, level.quantity_left, level.unit_price, threshold))
+
+    def threshold_for(self, item_name: str) -> int:
+        """An item's reorder threshold"""
+        with self._lock:
+            return self._thresholds.get(normalize_item_name(item_name), self.default_threshold)
+
+    def _place(self, key: str, level: StockLevel) -> Optional[Dict[str, Any]]:
+        previous = self._levels.get(key)
+        if previous is not None:
+            self._order.pop(bisect_left(self._order, (previous.headroom, key)))
+        self._levels[key] = level
+        insort(self._order, (level.headroom, key))
+
+        was_low = previous is not None and previous.is_low
+        if level.is_low == was_low:
+            return None
+        alert = level.to_dict()
+        alert["event"] = ALERT_LOW if level.is_low else ALERT_RESTOCKED
+        alert["at"] = datetime.now().isoformat(timespec="seconds")
+        return alert
+
+    def low_items(self) -> List[Dict[str, Any]]:
+        """Items below their threshold, least headroom first"""
+        with self._lock:
+            end = bisect_left(self._order, (0, ""))
+            return [self._levels[key].to_dict() for _, key in self._order[:end]]
+
+    def low_count(self) -> int:
+        return bisect_left(self._order, (0, ""))
+
+
+class AlertBroker:
+    """Fans alerts out to subscriber queues; publishing is safe from any thread"""
+
+    def __init__(self, queue_size: int = ALERT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.published = 0
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> asyncio.Queue:
+        """New queue receiving every alert; call from the event loop"""
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers.append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers = [(loop, q) for loop, q in self._subscribers if q is not queue]
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, alert: Dict[str, Any]) -> None:
+        self.published += 1
+        logger.info(f"[ALERT] {alert['event']}: {alert['item_name']} ({alert['quantity_left']} left, threshold {alert['threshold']})")
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, alert)
+            except RuntimeError:
+                # The subscriber's loop is closed
+                self.unsubscribe(queue)
+
+
+def _offer(queue: asyncio.Queue, alert: Dict[str, Any]) -> None:
+    if queue.full():
+        # A slow subscriber loses its oldest alert rather than blocking writers
+        queue.get_nowait()
+    queue.put_nowait(alert)
@@ -1,14 +1,36 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, File, HTTPException, Query, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 import os
 import json
+import re
+import time
+import asyncio
 import logging
-from datetime import datetime
+import datetime as dt
+from datetime import date, datetime
 import google.generativeai as genai
-from typing import Dict, Any, List
+from typing import Dict, Any, List, AsyncIterator, Literal, Optional, Tuple, Union
 from dotenv import load_dotenv
-from prompt_manager import get_formatted_prompt, get_prompt_info
+from prompt_manager import RenderedPrompt, get_prompt_info, get_prompt_version, get_rendered_prompt, prompt_manager
+from repository import InsufficientStockError, InventoryError, Repository, UnknownItemError, normalize_item_name
+from store import InMemoryStore
+from sqlite_store import SQLiteRepository
+from llm_client import AsyncLLMClient, ClientDisconnectedError, run_until_disconnected
+from response_cache import ResponseCache, normalize_query
+from intent_matcher import IntentMatcher
+from date_ranges import InvalidDate, parse_date_range
+from single_flight import SingleFlight
+from low_stock import AlertBroker, LowStockIndex
+from sessions import Session, SessionStore, is_bare_reference, strip_follow_up
+from payloads import FastJSONResponse, StreamAwareGZipMiddleware, project_context
+from ingest import DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE, detect_format, import_inventory, import_sales
+from metrics import SIZE_BUCKETS, MetricsRegistry, PrometheusMiddleware
+from answer_router import (
+    PATH_CACHE, PATH_DEMO, PATH_FALLBACK, PATH_FAST, PATH_LLM, RouteStats, is_fact_lookup, render_demo_response
+)
 
 # Load environment variables
 load_dotenv()
@@ -29,6 +51,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Metrics, exposed in Prometheus text format on /metrics
+metrics = MetricsRegistry()
+HTTP_LATENCY = metrics.histogram(
+    "swiggybot_http_request_seconds", "HTTP request latency", ["method", "route", "status"]
+)
+HTTP_IN_FLIGHT = metrics.gauge("swiggybot_http_requests_in_flight", "HTTP requests being served")
+STAGE_LATENCY = metrics.histogram(
+    "swiggybot_stage_seconds", "Latency of each chat pipeline stage", ["stage", "query_type"]
+)
+CHAT_LATENCY = metrics.histogram(
+    "swiggybot_chat_seconds", "End-to-end chat answer latency", ["query_type", "path"]
+)
+PROMPT_BYTES = metrics.histogram(
+    "swiggybot_prompt_bytes", "Size of prompts sent to Gemini", ["query_type"], buckets=SIZE_BUCKETS
+)
+PROMPT_TOKENS = metrics.counter(
+    "swiggybot_prompt_tokens_total", "Estimated prompt tokens sent to Gemini", ["query_type"]
+)
+RESPONSE_CHARS = metrics.histogram(
+    "swiggybot_response_chars", "Length of chat answers", ["query_type", "path"], buckets=SIZE_BUCKETS
+)
+PROMPT_RENDERS = metrics.counter(
+    "swiggybot_prompt_renders_total", "Prompts rendered per template version", ["query_type", "version"]
+)
+metrics.counter("swiggybot_prompt_reloads_total", "Prompt template hot reloads", callback=lambda: prompt_manager.reloads)
+ERRORS = metrics.counter("swiggybot_errors_total", "Errors per pipeline stage", ["stage"])
+app.add_middleware(PrometheusMiddleware, latency=HTTP_LATENCY, in_flight=HTTP_IN_FLIGHT)
+
+# Compress larger responses for clients that accept gzip (event streams are left alone)
+app.add_middleware(
+    StreamAwareGZipMiddleware,
+    minimum_size=int(os.getenv("GZIP_MINIMUM_SIZE", "1024")),
+    compresslevel=int(os.getenv("GZIP_LEVEL", "5"))
+)
+
 # Configure Gemini API
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if GEMINI_API_KEY:
@@ -38,16 +95,69 @@ else:
     print("Warning: GEMINI_API_KEY not found. Please set the environment variable.")
     model = None
 
+# Async LLM client (None means demo mode)
+llm_client = AsyncLLMClient(model) if model else None
+
 # Request/Response models
+# How much of the context to echo back in data_used
+DataUsedMode = Literal["none", "summary", "full"]
+
 class ChatRequest(BaseModel):
     message: str
+    data_used: DataUsedMode = "full"
+    page: int = Field(default=1, ge=1)
+    page_size: Optional[int] = Field(default=None, ge=1, le=1000)
+    # Continue a conversation; any client-chosen id, created on first use
+    session_id: Optional[str] = Field(default=None, min_length=1, max_length=128)
 
 class ChatResponse(BaseModel):
     response: str
-    data_used: Dict[str, Any] = None
+    data_used: Optional[Dict[str, Any]] = None
+    path: str = PATH_LLM
+    session_id: Optional[str] = None
+
+# Batch limits: queries per request and answers generated at once
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "1000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+
+class BatchChatRequest(BaseModel):
+    messages: List[str] = Field(min_length=1, max_length=BATCH_MAX_QUERIES)
+    data_used: DataUsedMode = "full"
+    page: int = Field(default=1, ge=1)
+    page_size: Optional[int] = Field(default=None, ge=1, le=1000)
+
+class BatchChatResult(BaseModel):
+    index: int
+    response: Optional[str] = None
+    path: Optional[str] = None
+    context_id: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchChatResult]
+    contexts: List[Dict[str, Any]]
+    seconds: float
 
-# In-memory database
-db = {
+class ThresholdUpdate(BaseModel):
+    threshold: int = Field(ge=0)
+
+class SaleEvent(BaseModel):
+    item_name: str
+    quantity_sold: int = Field(gt=0)
+    date: Optional[dt.date] = None
+    total_profit: Optional[float] = None
+
+class InventoryUpsert(BaseModel):
+    item_name: str
+    quantity_left: int = Field(ge=0)
+    unit_price: float = Field(ge=0)
+
+class RestockEvent(BaseModel):
+    quantity: int = Field(gt=0)
+    unit_price: Optional[float] = Field(default=None, ge=0)
+
+# Seed data for the in-memory database
+SEED_DATA = {
     "inventory": [
         {"item_name": "Burger", "quantity_left": 24, "unit_price": 120},
         {"item_name": "Pizza", "quantity_left": 10, "unit_price": 250},
@@ -66,195 +176,786 @@ db = {
     ]
 }
 
+# Storage backend: "memory" (default, per process) or "sqlite" (persistent, shared by workers)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory").lower()
+
+def create_repository() -> Repository:
+    """Build the configured repository, seeding it when empty"""
+    if STORAGE_BACKEND == "sqlite":
+        repository = SQLiteRepository(
+            os.getenv("SQLITE_PATH", "swiggybot.db"),
+            pool_size=int(os.getenv("SQLITE_POOL_SIZE", "4")),
+            pool_timeout=float(os.getenv("SQLITE_POOL_TIMEOUT_SECONDS", "10"))
+        )
+        repository.seed_if_empty(SEED_DATA["inventory"], SEED_DATA["sales"])
+        return repository
+    return InMemoryStore(SEED_DATA["inventory"], SEED_DATA["sales"])
+
+db = create_repository()
+
+async def run_db(fn, *args) -> Any:
+    """Call fn(*args), on a worker thread when it may wait on SQLite I/O or locks"""
+    if isinstance(db, SQLiteRepository):
+        return await run_in_threadpool(fn, *args)
+    # In-memory reads are index lookups; a thread hop would cost more than the call
+    return fn(*args)
+
+# LLM response cache; keys fingerprint the context, so changed data never hits a stale answer
+response_cache = ResponseCache()
+
+metrics.counter("swiggybot_cache_hits_total", "Response cache hits", callback=lambda: response_cache.hits)
+metrics.counter("swiggybot_cache_misses_total", "Response cache misses", callback=lambda: response_cache.misses)
+metrics.gauge("swiggybot_cache_entries", "Response cache entries", callback=lambda: len(response_cache))
+metrics.gauge(
+    "swiggybot_llm_requests_in_flight", "Gemini calls in flight",
+    callback=lambda: llm_client.in_flight if llm_client else 0
+)
+metrics.counter(
+    "swiggybot_llm_retries_total", "Gemini attempts retried after a failure or timeout",
+    callback=lambda: llm_client.retries if llm_client else 0
+)
+metrics.counter(
+    "swiggybot_llm_hedges_total", "Hedge requests sent for slow Gemini calls",
+    callback=lambda: llm_client.hedges if llm_client else 0
+)
+metrics.gauge(
+    "swiggybot_llm_circuit_open", "1 while the Gemini circuit breaker refuses calls",
+    callback=lambda: int(llm_client.breaker.is_open) if llm_client else 0
+)
+
+# Per-path traffic counters (fast path, cache, llm, demo)
+route_stats = RouteStats()
+# Identical /chat questions in flight at the same time share one answer
+chat_flight = SingleFlight()
+metrics.counter(
+    "swiggybot_chat_coalesced_total", "Chat requests answered by joining an identical in-flight request",
+    callback=lambda: chat_flight.coalesced
+)
+# Multi-turn conversations for /chat requests carrying a session_id
+session_store = SessionStore()
+metrics.gauge("swiggybot_sessions_active", "Conversation sessions held in memory", callback=lambda: len(session_store))
+
+# Answer pure data lookups without the LLM even when Gemini is configured
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() != "false"
+
+# Intent keywords, in priority order, compiled together with the menu catalog
+INTENT_KEYWORDS = {
+    "inventory": ["inventory", "stock", "left", "remaining", "available"],
+    "sales": ["profit", "sales", "revenue", "earnings"],
+    "low_stock": ["low", "running", "out", "shortage"],
+    "top_selling": ["top", "best", "popular", "selling"],
+}
+intent_matcher = IntentMatcher(INTENT_KEYWORDS, default_intent="overview")
+intent_matcher.set_catalog(item.item_name for item in db.items())
+
+# Per-item low-stock thresholds; threshold crossings are pushed to subscribers
+low_stock_index = LowStockIndex()
+low_stock_index.load(db.items(), db.thresholds())
+alert_broker = AlertBroker()
+metrics.gauge("swiggybot_low_stock_items", "Items below their threshold", callback=low_stock_index.low_count)
+metrics.counter("swiggybot_stock_alerts_total", "Low-stock and restocked alerts", callback=lambda: alert_broker.published)
+metrics.gauge(
+    "swiggybot_alert_subscribers", "Connected low-stock alert streams", callback=lambda: alert_broker.subscriber_count
+)
+
+def _on_data_change(change: str, item_name: str) -> None:
+    """Keep derived structures in sync with the store"""
+    if change == "inventory":
+        intent_matcher.add_item(item_name)
+        item = db.get_item(item_name)
+        alert = low_stock_index.update(item) if item else None
+        if alert:
+            alert_broker.publish(alert)
+    elif change == "threshold":
+        threshold = db.thresholds().get(normalize_item_name(item_name))
+        alert = low_stock_index.set_threshold(item_name, threshold) if threshold is not None else None
+        if alert:
+            alert_broker.publish(alert)
+
+db.add_listener(_on_data_change)
+
+# Store version the intent matcher and low-stock index last caught up with
+_derived_version = db.version
+
+def sync_derived_state() -> None:
+    """Catch the intent matcher and low-stock index up with other workers' writes
+
+    Only the SQLite store is shared between processes. This worker's own
+    writes already reach both through change listeners, so any version change
+    costs one read of the inventory and thresholds. The reread is diffed into
+    the index, so threshold crossings from other workers raise alerts here too.
+    """
+    global _derived_version
+    if not isinstance(db, SQLiteRepository):
+        return
+    version = db.version
+    if version == _derived_version:
+        return
+    alerts = [low_stock_index.set_threshold(key, threshold) for key, threshold in db.thresholds().items()]
+    for item in db.items():
+        intent_matcher.add_item(item.item_name)
+        alerts.append(low_stock_index.update(item))
+    _derived_version = version
+    for alert in alerts:
+        if alert:
+            alert_broker.publish(alert)
+
+# Date that "today" means in questions; defaults to the latest date with sales
+BUSINESS_DATE = os.getenv("BUSINESS_DATE")
+
+def current_business_date() -> date:
+    """Reference date for "today", "last week" and other relative ranges"""
+    if BUSINESS_DATE:
+        return date.fromisoformat(BUSINESS_DATE)
+    latest = db.latest_sale_date()
+    return date.fromisoformat(latest) if latest else datetime.now().date()
+
 # Database helper functions
 def get_inventory_by_item(item_name: str) -> Dict[str, Any]:
-    """Get inventory details for a specific item"""
-    for item in db["inventory"]:
-        if item["item_name"].lower() == item_name.lower():
-            return item
-    return None
+    """Get inventory details for a specific item, with its reorder threshold"""
+    item = db.get_item(item_name)
+    if item is None:
+        return None
+    threshold = low_stock_index.threshold_for(item.item_name)
+    return {**item.to_dict(), "threshold": threshold, "is_low": item.quantity_left < threshold}
 
 def get_all_inventory() -> List[Dict[str, Any]]:
     """Get all inventory items"""
-    return db["inventory"]
+    return [item.to_dict() for item in db.items()]
 
-def get_low_stock_items(threshold: int = 10) -> List[Dict[str, Any]]:
-    """Get items with stock below threshold"""
-    return [item for item in db["inventory"] if item["quantity_left"] < threshold]
+def get_low_stock_items(threshold: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Get items below their own threshold, or below a given one"""
+    if threshold is None:
+        return low_stock_index.low_items()
+    return [item.to_dict() for item in db.items_below(threshold)]
 
 def get_sales_by_date(date: str) -> List[Dict[str, Any]]:
     """Get sales for a specific date"""
-    return [sale for sale in db["sales"] if sale["date"] == date]
+    return [sale.to_dict() for sale in db.sales_on(date)]
 
 def get_total_profit_by_date(date: str) -> float:
     """Get total profit for a specific date"""
-    daily_sales = get_sales_by_date(date)
-    return sum(sale["total_profit"] for sale in daily_sales)
+    return db.profit_on(date)
 
 def get_total_profit_all_time() -> float:
     """Get total profit across all dates"""
-    return sum(sale["total_profit"] for sale in db["sales"])
+    return db.total_profit()
+
+def get_sales_summary(start: Optional[str], end: Optional[str]) -> Dict[str, Any]:
+    """Aggregated totals and per-item breakdown for dates in [start, end]"""
+    totals = db.totals_between(start, end)
+    return {
+        "total_profit": totals.total_profit,
+        "quantity_sold": totals.quantity_sold,
+        "transactions": totals.sales_count,
+        "items": [item.to_dict() for item in db.item_totals_between(start, end)]
+    }
 
-def get_top_selling_items() -> List[Dict[str, Any]]:
+def get_top_selling_items(limit: int = None) -> List[Dict[str, Any]]:
     """Get items sorted by quantity sold"""
-    item_sales = {}
-    for sale in db["sales"]:
-        item_name = sale["item_name"]
-        if item_name not in item_sales:
-            item_sales[item_name] = {"item_name": item_name, "total_sold": 0, "total_profit": 0}
-        item_sales[item_name]["total_sold"] += sale["quantity_sold"]
-        item_sales[item_name]["total_profit"] += sale["total_profit"]
-    
-    return sorted(item_sales.values(), key=lambda x: x["total_sold"], reverse=True)
+    return [totals.to_dict() for totals in db.top_selling(limit)]
 
-def search_database_context(query: str) -> Dict[str, Any]:
-    """Search database and return relevant context based on query"""
-    query_lower = query.lower()
-    context = {"query_type": "general", "data": {}}
+# What a query needs from the data: (query_type, item_name, start_date, end_date, period).
+# The period is an InvalidDate when the query names dates that do not exist.
+# Queries with equal specs get equal contexts, which lets batches share them.
+ContextSpec = Tuple[str, Optional[str], Optional[str], Optional[str], Union[str, InvalidDate, None]]
+
+def resolve_context_spec(query: str, previous: Optional[ContextSpec] = None) -> ContextSpec:
+    """Detect the query type and the item or date range it is about
+
+    `previous` is the spec of the prior turn in a conversation. A follow-up
+    keeps the prior query type, swapping in the item or date range it does
+    name. A follow-up either starts with a lead-in ("and what about pasta?")
+    or names only an item or dates ("yesterday?"), and has no intent keyword
+    of its own; anything else ("how is the restaurant doing?") stands alone.
+    """
+    sync_derived_state()
+    lead_in = False
+    if previous is not None:
+        query, lead_in = strip_follow_up(query)
+    match = intent_matcher.match(query)
+    follow_up = previous is not None and not match.keywords and (
+        lead_in or ((match.item_name is not None or parse_date_range(query, current_business_date()) is not None)
+                    and is_bare_reference(query, match.item_name))
+    )
+    intent = previous[0] if follow_up else match.intent
+    if intent == "inventory":
+        return ("inventory", match.item_name or (previous[1] if follow_up else None), None, None, None)
+    if intent == "sales":
+        date_range = parse_date_range(query, current_business_date())
+        if date_range is None:
+            return previous if follow_up else ("sales", None, None, None, "all time")
+        if isinstance(date_range, InvalidDate):
+            return ("sales", None, None, None, date_range)
+        return ("sales", None, date_range.start.isoformat(), date_range.end.isoformat(), date_range.label)
+    if intent in ("low_stock", "top_selling"):
+        return (intent, None, None, None, None)
+    return ("overview", None, None, None, None)
+
+def build_context(spec: ContextSpec) -> Dict[str, Any]:
+    """Fetch the data described by a context spec"""
+    query_type, item_name, start, end, period = spec
+    context = {"query_type": query_type, "data": {}}
     
-    # Detect query type and fetch relevant data
-    if any(word in query_lower for word in ["inventory", "stock", "left", "remaining", "available"]):
-        context["query_type"] = "inventory"
-        if any(item["item_name"].lower() in query_lower for item in db["inventory"]):
+    if query_type == "inventory":
+        if item_name:
             # Specific item query
-            for item in db["inventory"]:
-                if item["item_name"].lower() in query_lower:
-                    context["data"] = get_inventory_by_item(item["item_name"])
-                    break
+            context["data"] = get_inventory_by_item(item_name)
         else:
             # General inventory query
             context["data"] = get_all_inventory()
     
-    elif any(word in query_lower for word in ["profit", "sales", "revenue", "earnings"]):
-        context["query_type"] = "sales"
-        if "today" in query_lower or "2025-09-09" in query_lower:
-            context["data"] = {
-                "date": "2025-09-09",
-                "sales": get_sales_by_date("2025-09-09"),
-                "total_profit": get_total_profit_by_date("2025-09-09")
-            }
+    elif query_type == "sales":
+        # Only aggregates for the asked period go into the context, never raw rows
+        if isinstance(period, InvalidDate):
+            # No totals: an all-time figure would read as the answer for the bad dates
+            context["data"] = {"period": "invalid date", "invalid_date": period.reason}
+        elif start is None:
+            context["data"] = {"period": period, **get_sales_summary(None, None)}
         else:
             context["data"] = {
-                "all_sales": db["sales"],
-                "total_profit": get_total_profit_all_time()
+                "period": period,
+                "start_date": start,
+                "end_date": end,
+                **get_sales_summary(start, end)
             }
+            if start == end:
+                context["data"]["date"] = start
     
-    elif any(word in query_lower for word in ["low", "running", "out", "shortage"]):
-        context["query_type"] = "low_stock"
+    elif query_type == "low_stock":
         context["data"] = get_low_stock_items()
     
-    elif any(word in query_lower for word in ["top", "best", "popular", "selling"]):
-        context["query_type"] = "top_selling"
+    elif query_type == "top_selling":
         context["data"] = get_top_selling_items()
     
     else:
         # General query - provide overview
-        context["query_type"] = "overview"
         context["data"] = {
             "inventory": get_all_inventory(),
-            "recent_sales": get_sales_by_date("2025-09-09"),
+            "recent_sales": get_sales_by_date(current_business_date().isoformat()),
             "total_profit": get_total_profit_all_time()
         }
     
     return context
 
-def generate_llm_response(query: str, context: Dict[str, Any]) -> str:
+def search_database_context(query: str) -> Dict[str, Any]:
+    """Search database and return relevant context based on query"""
+    return build_context(resolve_context_spec(query))
+
+async def call_llm(query: str, context: Dict[str, Any]) -> str:
+    """Render the prompt for this query type and call Gemini"""
+    # Get comprehensive prompt from file-based system
+    query_type = context.get("query_type", "default")
+    prompt = build_prompt(query_type, query, context)
+    
+    logger.info("[GEMINI] Calling model gemini-1.5-flash ...")
+    started_at = time.perf_counter()
+    try:
+        text = await llm_client.generate(prompt.text)
+    except Exception:
+        ERRORS.inc("model")
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started_at, "model", query_type)
+    logger.info(f"[GEMINI] Received response (chars={len(text)}).")
+    return text
+
+def build_prompt(query_type: str, query: str, context: Dict[str, Any]) -> RenderedPrompt:
+    """Render the prompt, recording its latency and size"""
+    started_at = time.perf_counter()
+    prompt = get_rendered_prompt(query_type, query, context)
+    STAGE_LATENCY.observe(time.perf_counter() - started_at, "prompt", query_type)
+    PROMPT_BYTES.observe(prompt.prompt_bytes, query_type)
+    PROMPT_TOKENS.inc(query_type, amount=prompt.prompt_tokens)
+    PROMPT_RENDERS.inc(query_type, prompt.template_version)
+    
+    logger.info(f"[GEMINI] Using '{query_type}' prompt template")
+    logger.info(f"[GEMINI] Prompt size: {prompt.prompt_bytes} bytes, ~{prompt.prompt_tokens} tokens (truncated={prompt.truncated})")
+    return prompt
+
+async def generate_llm_response(query: str, context: Dict[str, Any]) -> str:
     """Generate response using Gemini API or demo mode"""
-    if not model:
-        # Demo mode: Generate realistic responses based on context
-        query_type = context.get("query_type", "general")
-        data = context.get("data", {})
-        
-        if query_type == "inventory":
-            if isinstance(data, dict) and data.get("item_name"):
-                quantity = data['quantity_left']
-                price = data['unit_price']
-                item = data['item_name']
-                return f"You currently have {quantity} {item.lower()}s left in stock, priced at ₹{price} each. {'⚠️ Running low!' if quantity < 10 else '✅ Stock looks good!'}"
-            elif isinstance(data, list):
-                items = [f"{item['item_name']}: {item['quantity_left']} units" for item in data]
-                return f"📦 **Inventory Overview:**\n" + "\n".join(items)
-            return "I couldn't find specific inventory details for that query."
-        
-        elif query_type == "sales":
-            if "date" in data:
-                date = data["date"]
-                total_profit = data.get("total_profit", 0)
-                sales_count = len(data.get("sales", []))
-                return f"📊 **Sales Report for {date}:**\n💰 Total Profit: ₹{total_profit:,}\n📈 Number of transactions: {sales_count}"
-            else:
-                total_profit = data.get("total_profit", 0)
-                return f"💰 **All-time total profit:** ₹{total_profit:,}\n🎯 Great job managing your restaurant!"
-        
-        elif query_type == "low_stock":
-            if isinstance(data, list) and data:
-                low_items = [f"• {item['item_name']}: Only {item['quantity_left']} left" for item in data]
-                return f"⚠️ **Low Stock Alert:**\n" + "\n".join(low_items) + "\n\n💡 Consider restocking these items soon!"
-            return "✅ All items are well-stocked! No items are running low."
-        
-        elif query_type == "top_selling":
-            if isinstance(data, list) and data:
-                top_items = [f"{i+1}. {item['item_name']}: {item['total_sold']} sold (₹{item['total_profit']} profit)" for i, item in enumerate(data[:5])]
-                return f"🏆 **Top Selling Items:**\n" + "\n".join(top_items)
-            return "📊 No sales data available yet to determine top-selling items."
-        
-        elif query_type == "overview":
-            inventory_count = len(data.get("inventory", []))
-            recent_sales = len(data.get("recent_sales", []))
-            total_profit = data.get("total_profit", 0)
-            return f"🏪 **Restaurant Overview:**\n📦 Inventory Items: {inventory_count}\n📊 Today's Sales: {recent_sales} transactions\n💰 All-time Profit: ₹{total_profit:,}\n\n🤖 *Demo Mode Active - Get your Gemini API key for smarter responses!*"
-        
-        return "🤖 I'm running in demo mode! Ask me about inventory, sales, profits, or low stock items.\n\n💡 *Get a Gemini API key for more intelligent responses!*"
+    if llm_client is None:
+        return render_demo_response(query, context)
     
     try:
-        # Get comprehensive prompt from file-based system
-        query_type = context.get("query_type", "default")
-        prompt = get_formatted_prompt(query_type, query, context)
-        
-        logger.info(f"[GEMINI] Using '{query_type}' prompt template")
-        logger.info("[GEMINI] Calling model gemini-1.5-flash ...")
-        response = model.generate_content(prompt)
-        text = getattr(response, 'text', '') or ''
-        logger.info(f"[GEMINI] Received response (chars={len(text)}).")
-        return text
-        
+        return await call_llm(query, context)
     except Exception as e:
-        return f"I apologize, but I encountered an error processing your request: {str(e)}"
+        logger.warning(f"[GEMINI] Falling back to the demo renderer: {e}")
+        return render_demo_response(query, context)
+
+def llm_cache_key(query: str, context: Dict[str, Any]) -> str:
+    """Cache key of an LLM answer; editing the prompt template changes it"""
+    query_type = context.get("query_type", "default")
+    return response_cache.make_key(query_type, query, context, get_prompt_version(query_type))
+
+async def answer_query(query: str, context: Dict[str, Any], llm_query: Optional[str] = None) -> Tuple[str, str]:
+    """Answer from the data when possible, else from cache or the LLM; returns (text, path)
+
+    `llm_query` replaces the query in the LLM prompt and cache key, e.g. to
+    prefix the conversation history; routing still looks at the bare query.
+    """
+    llm_query = llm_query or query
+    started_at = time.perf_counter()
+    if FAST_PATH_ENABLED and is_fact_lookup(query, context):
+        path, text = PATH_FAST, render_demo_response(query, context)
+    elif llm_client is None:
+        path, text = PATH_DEMO, render_demo_response(query, context)
+    else:
+        cache_key = llm_cache_key(llm_query, context)
+        text = response_cache.get(cache_key)
+        if text is not None:
+            path = PATH_CACHE
+        else:
+            path = PATH_LLM
+            try:
+                text = await call_llm(llm_query, context)
+                if text:
+                    response_cache.set(cache_key, text)
+            except Exception as e:
+                # Retries are exhausted or the breaker is open: answer from the data instead
+                logger.warning(f"[GEMINI] Falling back to the demo renderer: {e}")
+                path, text = PATH_FALLBACK, render_demo_response(query, context)
+    record_answer(context.get("query_type", "default"), path, started_at, len(text))
+    logger.info(f"[ROUTER] Answered '{context.get('query_type')}' query via {path}")
+    return text, path
+
+def record_answer(query_type: str, path: str, started_at: float, chars: int) -> None:
+    """Account one finished answer in routing stats and metrics"""
+    route_stats.record(path, started_at)
+    CHAT_LATENCY.observe(time.perf_counter() - started_at, query_type, path)
+    RESPONSE_CHARS.observe(chars, query_type, path)
+
+def timed_search(query: str) -> Dict[str, Any]:
+    """search_database_context with stage latency recorded"""
+    return timed_build(resolve_context_spec(query))
+
+def timed_build(spec: ContextSpec) -> Dict[str, Any]:
+    """build_context with stage latency recorded"""
+    started_at = time.perf_counter()
+    try:
+        context = build_context(spec)
+    except Exception:
+        ERRORS.inc("search")
+        raise
+    STAGE_LATENCY.observe(time.perf_counter() - started_at, "search", context["query_type"])
+    return context
+
+async def stream_llm_response(query: str, context: Dict[str, Any]) -> AsyncIterator[str]:
+    """Stream response text deltas from Gemini API or demo mode"""
+    if llm_client is None:
+        # Demo mode streams the rendered answer word by word
+        for chunk in re.findall(r"\S+\s*", render_demo_response(query, context)):
+            yield chunk
+        return
+    
+    query_type = context.get("query_type", "default")
+    prompt = build_prompt(query_type, query, context)
+    
+    logger.info("[GEMINI] Streaming from model gemini-1.5-flash ...")
+    started_at = time.perf_counter()
+    chars = 0
+    try:
+        async for text in llm_client.stream(prompt.text):
+            chars += len(text)
+            yield text
+    except Exception:
+        ERRORS.inc("model")
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started_at, "model", query_type)
+    logger.info(f"[GEMINI] Finished stream (chars={chars}).")
+
+def route_stream(query: str, context: Dict[str, Any], llm_query: Optional[str] = None) -> Tuple[AsyncIterator[str], str]:
+    """Pick the answer path for a streamed query; returns (deltas, path)
+
+    `llm_query` plays the same role as in `answer_query`.
+    """
+    llm_query = llm_query or query
+    if FAST_PATH_ENABLED and is_fact_lookup(query, context):
+        return _stream_text(render_demo_response(query, context)), PATH_FAST
+    if llm_client is None:
+        return stream_llm_response(query, context), PATH_DEMO
+    if llm_client.breaker.is_open:
+        return _stream_text(render_demo_response(query, context)), PATH_FALLBACK
+    cache_key = llm_cache_key(llm_query, context)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return _stream_text(cached), PATH_CACHE
+    return _stream_and_cache(llm_query, context, cache_key), PATH_LLM
+
+async def _stream_text(text: str) -> AsyncIterator[str]:
+    yield text
+
+async def _stream_and_cache(query: str, context: Dict[str, Any], cache_key: str) -> AsyncIterator[str]:
+    parts = []
+    async for text in stream_llm_response(query, context):
+        parts.append(text)
+        yield text
+    if parts:
+        response_cache.set(cache_key, "".join(parts))
+
+def format_sse(event: str, payload: Any) -> str:
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
 # API Routes
 @app.get("/")
 async def root():
     return {"message": "Swiggy Chatbot API is running!"}
 
+async def answer_chat(query: str) -> Tuple[Dict[str, Any], str, str]:
+    """Search the data and answer; returns (context, text, path)"""
+    context = await run_db(timed_search, query)
+    text, path = await answer_query(query, context)
+    return context, text, path
+
+def chat_flight_key(query: str) -> str:
+    """Same question against the same data -> same answer"""
+    return f"{normalize_query(query)}|{db.version}"
+
+async def coalesced_chat(query: str) -> Tuple[Dict[str, Any], str, str]:
+    """answer_chat shared with identical requests in flight"""
+    key = await run_db(chat_flight_key, query)
+    result, _ = await chat_flight.do(key, lambda: answer_chat(query))
+    return result
+
+async def session_turn_context(session: Session, query: str) -> Tuple[ContextSpec, int, Dict[str, Any]]:
+    """Resolve a turn against the conversation; returns (spec, data version, context). Hold session.lock"""
+    spec = await run_db(resolve_context_spec, query, session.last_spec)
+    version = await run_db(lambda: db.version)
+    # A follow-up about the same thing on unchanged data reuses the last context
+    context = session.cached_context(spec, version) or await run_db(timed_build, spec)
+    return spec, version, context
+
+async def answer_session_turn(session: Session, query: str) -> Tuple[Dict[str, Any], str, str]:
+    """Answer the next turn of a conversation; returns (context, text, path)"""
+    async with session.lock:
+        spec, version, context = await session_turn_context(session, query)
+        # The prompt carries the capped history once; the data goes in only as the current context
+        text, path = await answer_query(query, context, llm_query=session.prompt_query(query))
+        session.add_turn(query, text, spec, context, version)
+        return context, text, path
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     try:
-        # Search database for relevant context
-        context = search_database_context(request.message)
+        # Search and answer via fast path, cache or LLM, abandoning the work if the
+        # client goes away. Stateless questions share work with identical requests
+        # in flight; turns of a session depend on its history so run on their own.
+        if request.session_id:
+            work = answer_session_turn(session_store.get(request.session_id), request.message)
+        else:
+            work = coalesced_chat(request.message)
+        context, response_text, path = await run_until_disconnected(http_request, work)
         
-        # Generate response using LLM
-        response_text = generate_llm_response(request.message, context)
+        # Built directly: the context is already plain JSON data, so skip re-validating it
+        body = {
+            "response": response_text,
+            "data_used": project_context(context, request.data_used, request.page, request.page_size),
+            "path": path
+        }
+        if request.session_id:
+            body["session_id"] = request.session_id
+        return FastJSONResponse(body)
         
-        return ChatResponse(
-            response=response_text,
-            data_used=context
-        )
+    except ClientDisconnectedError:
+        # Nobody is listening any more; 499 mirrors the nginx convention
+        return Response(status_code=499)
         
     except Exception as e:
+        ERRORS.inc("chat")
         raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the answer as Server-Sent Events: context, then text deltas, then done
+
+    Takes the same fields as /chat: `data_used`, `page` and `page_size` shape
+    the context event, and a `session_id` makes the stream a conversation turn.
+    """
+    started_at = time.perf_counter()
+    query = request.message
+    session = session_store.get(request.session_id) if request.session_id else None
+    searched = None if session else await run_db(timed_search, query)
+    
+    async def turn() -> AsyncIterator[str]:
+        parts = []
+        try:
+            if session is None:
+                context, llm_query = searched, None
+            else:
+                spec, version, context = await session_turn_context(session, query)
+                llm_query = session.prompt_query(query)
+            deltas, path = route_stream(query, context, llm_query)
+            yield format_sse("context", project_context(context, request.data_used, request.page, request.page_size))
+            try:
+                async for text in deltas:
+                    parts.append(text)
+                    yield format_sse("delta", {"text": text})
+            except Exception as e:
+                # Nothing sent yet: answer from the data, as /chat does; a partial answer can only end in an error
+                if parts or path != PATH_LLM:
+                    raise
+                logger.warning(f"[GEMINI] Falling back to the demo renderer: {e}")
+                path = PATH_FALLBACK
+                parts.append(render_demo_response(query, context))
+                yield format_sse("delta", {"text": parts[-1]})
+        except Exception as e:
+            yield format_sse("error", {"detail": f"Error processing chat request: {str(e)}"})
+            return
+        text = "".join(parts)
+        record_answer(context["query_type"], path, started_at, len(text))
+        done = {"path": path}
+        if session is not None:
+            session.add_turn(query, text, spec, context, version)
+            done["session_id"] = session.session_id
+        yield format_sse("done", done)
+    
+    async def events() -> AsyncIterator[str]:
+        if session is None:
+            async for event in turn():
+                yield event
+            return
+        # A conversation turn holds its session until the answer is complete and recorded
+        async with session.lock:
+            async for event in turn():
+                yield event
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def build_batch_contexts(queries: List[str]) -> Tuple[List[Optional[int]], List[Dict[str, Any]], List[Optional[str]]]:
+    """Resolve every query, then build each distinct context once
+
+    Returns (context id per query, distinct contexts, error per query).
+    """
+    specs: Dict[ContextSpec, int] = {}
+    contexts: List[Dict[str, Any]] = []
+    context_ids: List[Optional[int]] = []
+    errors: List[Optional[str]] = []
+    for query in queries:
+        try:
+            spec = resolve_context_spec(query)
+            context_id = specs.get(spec)
+            if context_id is None:
+                started_at = time.perf_counter()
+                contexts.append(build_context(spec))
+                STAGE_LATENCY.observe(time.perf_counter() - started_at, "search", spec[0])
+                context_id = specs[spec] = len(contexts) - 1
+            context_ids.append(context_id)
+            errors.append(None)
+        except Exception as e:
+            ERRORS.inc("search")
+            context_ids.append(None)
+            errors.append(f"Error building context: {str(e)}")
+    return context_ids, contexts, errors
+
+async def answer_with_context(query: str, context: Dict[str, Any]) -> Tuple[Dict[str, Any], str, str]:
+    text, path = await answer_query(query, context)
+    return context, text, path
+
+@app.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(request: BatchChatRequest, http_request: Request):
+    """Answer many queries at once; results come back in input order"""
+    started_at = time.perf_counter()
+    context_ids, contexts, errors = await run_db(build_batch_contexts, request.messages)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def generate(query: str, context: Dict[str, Any]) -> Tuple[Dict[str, Any], str, str]:
+        async with semaphore:
+            return await answer_with_context(query, context)
+    
+    async def answer(index: int, query: str) -> BatchChatResult:
+        context_id = context_ids[index]
+        if context_id is None:
+            return BatchChatResult(index=index, error=errors[index])
+        context = contexts[context_id]
+        try:
+            # Repeated questions, in this batch or in /chat, share one answer
+            (_, text, path), _ = await chat_flight.do(
+                await run_db(chat_flight_key, query), lambda: generate(query, context)
+            )
+            return BatchChatResult(index=index, response=text, path=path, context_id=context_id)
+        except Exception as e:
+            ERRORS.inc("chat")
+            return BatchChatResult(index=index, context_id=context_id, error=f"Error processing chat request: {str(e)}")
+    
+    try:
+        results = await run_until_disconnected(
+            http_request, asyncio.gather(*(answer(i, q) for i, q in enumerate(request.messages)))
+        )
+    except ClientDisconnectedError:
+        return Response(status_code=499)
+    
+    logger.info(f"[BATCH] {len(results)} queries, {len(contexts)} distinct contexts")
+    projected = [] if request.data_used == "none" else [
+        project_context(context, request.data_used, request.page, request.page_size) for context in contexts
+    ]
+    return FastJSONResponse({
+        "results": [result.model_dump() for result in results],
+        "contexts": projected,
+        "seconds": round(time.perf_counter() - started_at, 4)
+    })
+
+def inventory_error_status(e: InventoryError) -> HTTPException:
+    """Map repository write errors onto HTTP status codes"""
+    if isinstance(e, UnknownItemError):
+        return HTTPException(status_code=404, detail=str(e))
+    if isinstance(e, InsufficientStockError):
+        return HTTPException(status_code=409, detail=str(e))
+    return HTTPException(status_code=422, detail=str(e))
+
+# Store-only endpoints are plain functions: FastAPI runs them on its thread pool,
+# so SQLite writes waiting on the database lock never stall the event loop
+@app.post("/sales", status_code=201)
+def record_sale(event: SaleEvent):
+    """Record one sale, atomically decrementing the item's stock"""
+    try:
+        sale, item = db.record_sale(
+            (event.date or datetime.now().date()).isoformat(),
+            event.item_name, event.quantity_sold, event.total_profit
+        )
+    except InventoryError as e:
+        raise inventory_error_status(e)
+    return {"sale": sale.to_dict(), "inventory": item.to_dict()}
+
+@app.put("/inventory")
+def upsert_inventory(item: InventoryUpsert):
+    """Add a menu item or replace its stock and price"""
+    return db.upsert_item(item.item_name, item.quantity_left, item.unit_price).to_dict()
+
+@app.post("/inventory/{item_name}/restock")
+def restock_item(item_name: str, event: RestockEvent):
+    """Add units to an item's stock"""
+    try:
+        return db.restock(item_name, event.quantity, event.unit_price).to_dict()
+    except InventoryError as e:
+        raise inventory_error_status(e)
+
+@app.put("/inventory/{item_name}/threshold")
+def set_low_stock_threshold(item_name: str, update: ThresholdUpdate):
+    """Set the quantity below which an item counts as low on stock"""
+    item = db.get_item(item_name)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Unknown item '{item_name}'")
+    # Stored with the data so every worker uses it; the change listener re-checks the item
+    db.set_threshold(item.item_name, update.threshold)
+    return {**item.to_dict(), "threshold": update.threshold, "is_low": item.quantity_left < update.threshold}
+
+@app.get("/alerts/low-stock")
+async def low_stock_alerts():
+    """Items currently below their threshold, least headroom first"""
+    await run_db(sync_derived_state)
+    return {"default_threshold": low_stock_index.default_threshold, "items": low_stock_index.low_items()}
+
+# Comment line sent on idle alert streams so proxies keep them open
+ALERT_KEEPALIVE_SECONDS = 15.0
+# How often idle alert streams look for other workers' writes
+ALERT_SYNC_SECONDS = float(os.getenv("ALERT_SYNC_SECONDS", "5"))
+
+@app.get("/alerts/low-stock/stream")
+async def low_stock_alert_stream():
+    """Server-Sent Events: a snapshot of low items, then an event per threshold crossing"""
+    async def events() -> AsyncIterator[str]:
+        queue = alert_broker.subscribe()
+        try:
+            await run_db(sync_derived_state)
+            yield format_sse("snapshot", {"items": low_stock_index.low_items()})
+            idle = 0.0
+            while True:
+                try:
+                    alert = await asyncio.wait_for(queue.get(), ALERT_SYNC_SECONDS)
+                except asyncio.TimeoutError:
+                    # Crossings caused by other workers arrive through the sync's alerts
+                    await run_db(sync_derived_state)
+                    idle += ALERT_SYNC_SECONDS
+                    if idle >= ALERT_KEEPALIVE_SECONDS:
+                        idle = 0.0
+                        yield ": keepalive\n\n"
+                    continue
+                idle = 0.0
+                yield format_sse(alert["event"], alert)
+        finally:
+            alert_broker.unsubscribe(queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _import_format(file: UploadFile, file_format: Optional[str]) -> str:
+    resolved = detect_format(file.filename, file_format)
+    if resolved not in ("csv", "jsonl"):
+        raise HTTPException(status_code=400, detail=f"Unsupported import format '{resolved}'")
+    return resolved
+
+@app.post("/import/sales")
+async def import_sales_file(file: UploadFile = File(...), file_format: Optional[str] = None,
+                            chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=MAX_CHUNK_SIZE)):
+    """Stream a CSV/JSONL file of sales into the store in chunks"""
+    resolved = _import_format(file, file_format)
+    # Parsing and writing run on a worker thread so chats keep flowing
+    return await run_in_threadpool(
+        import_sales, db, file.file, resolved, chunk_size, datetime.now().date().isoformat()
+    )
+
+@app.post("/import/inventory")
+async def import_inventory_file(file: UploadFile = File(...), file_format: Optional[str] = None,
+                                chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=MAX_CHUNK_SIZE)):
+    """Stream a CSV/JSONL file of inventory items into the store in chunks"""
+    resolved = _import_format(file, file_format)
+    return await run_in_threadpool(import_inventory, db, file.file, resolved, chunk_size)
+
 @app.get("/health")
-async def health_check():
+def health_check():
     return {
         "status": "healthy",
         "gemini_api_configured": GEMINI_API_KEY is not None,
-        "database_items": len(db["inventory"]),
-        "sales_records": len(db["sales"])
+        "database_items": db.item_count,
+        "sales_records": db.sale_count
+    }
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters of the LLM response cache"""
+    return response_cache.stats()
+
+@app.get("/routing/stats")
+async def routing_stats():
+    """How many answers each path (fast_path, cache, llm, demo, fallback) served, how fast,
+    how many were coalesced, and Gemini retries, hedges and circuit breaker state"""
+    return {
+        **route_stats.stats(),
+        "coalescing": chat_flight.stats(),
+        "model": llm_client.stats() if llm_client else None
     }
 
+@app.get("/sessions/stats")
+async def session_stats():
+    """Active conversation sessions and how many were created, expired or evicted"""
+    return session_store.stats()
+
+@app.delete("/sessions/{session_id}", status_code=204)
+async def end_session(session_id: str):
+    """Forget a conversation"""
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+    return Response(status_code=204)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Latency histograms, sizes, errors and gauges in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/prompt-info")
 async def prompt_info():
-    """Get information about loaded prompt templates (for demo purposes)"""
+    """Discovered prompt templates with their validation status and versions; validation
+    happens once per template version, not on every call"""
     return get_prompt_info()
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+"""
+Response Payloads for SwiggyBot
+Projection and pagination of the `data_used` context echoed back to
+clients, a compact JSON response class (orjson, stdlib json as fallback) and gzip
+that leaves event streams alone
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    import orjson
+except ImportError:  # pinned in requirements.txt; kept working for installs without its wheel
+    orjson = None
+
+DATA_USED_NONE = "none"
+DATA_USED_SUMMARY = "summary"
+DATA_USED_FULL = "full"
+
+
+def _column_totals(rows: list) -> Dict[str, Any]:
+    totals: Dict[str, Any] = {}
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _summarize(value: Any) -> Any:
+    """Lists become their row count and numeric column totals"""
+    if isinstance(value, dict):
+        return {key: _summarize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        summary: Dict[str, Any] = {"total_count": len(value)}
+        if value and all(isinstance(row, dict) for row in value):
+            summary["column_totals"] = _column_totals(value)
+        return summary
+    return value
+
+
+def _paginate(value: Any, page: int, page_size: int) -> Any:
+    """Lists longer than a page become one page plus paging metadata"""
+    if isinstance(value, dict):
+        return {key: _paginate(item, page, page_size) for key, item in value.items()}
+    if isinstance(value, list) and len(value) > page_size:
+        start = (page - 1) * page_size
+        return {
+            "items": value[start:start + page_size],
+            "page": page,
+            "page_size": page_size,
+            "total_count": len(value),
+            "has_more": start + page_size < len(value),
+        }
+    return value
+
+
+def project_context(context: Dict[str, Any], mode: str = DATA_USED_FULL,
+                    page: int = 1, page_size: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Shape the context for the response: none, summary, or full (optionally paginated)"""
+    if mode == DATA_USED_NONE:
+        return None
+    if mode == DATA_USED_SUMMARY:
+        return _summarize(context)
+    if page_size:
+        return _paginate(context, page, page_size)
+    return context
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, or compact json when it is missing"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class StreamAwareGZipMiddleware(GZipMiddleware):
+    """GZip for regular responses; `/stream` endpoints pass through untouched
+    so Server-Sent Events are not held back in the compressor's buffer"""
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
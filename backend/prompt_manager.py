@@ -1,67 +1,386 @@
 """
 Prompt Management System for SwiggyBot
-Handles loading, caching, and validation of prompt templates
+Handles discovery, lazy loading, validation and hot reloading of prompt
+templates
 """
 
 import os
 import json
-from typing import Dict, Optional
+import time
+import hashlib
+import threading
+from string import Formatter
+from typing import Any, Dict, List, Optional, Set, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Templates live next to this module, whatever the working directory
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+TEMPLATE_SUFFIX = ".txt"
+REQUIRED_PLACEHOLDERS = ("query", "context")
+# How often template files are checked for edits; 0 disables watching
+PROMPT_RELOAD_INTERVAL_SECONDS = float(os.getenv("PROMPT_RELOAD_INTERVAL_SECONDS", "2"))
+
+# Rough Gemini tokenization ratio used for budgeting
+CHARS_PER_TOKEN = 4
+DEFAULT_CONTEXT_TOKEN_BUDGET = int(os.getenv("PROMPT_CONTEXT_TOKEN_BUDGET", "2000"))
+# Per query type overrides, e.g. "sales=4000,overview=1500"
+CONTEXT_TOKEN_BUDGETS = os.getenv("PROMPT_CONTEXT_TOKEN_BUDGETS", "")
+# Sample sizes tried, largest first, when a context list has to be shrunk
+SAMPLE_SIZES = (50, 20, 10, 5, 1, 0)
+# Dicts up to this many keys are records, trimmed entry by entry; larger ones are maps, dropped whole
+MAX_RECORD_KEYS = 20
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for budgeting and reporting"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def parse_token_budgets(spec: str) -> Dict[str, int]:
+    """Parse "query_type=tokens" pairs separated by commas"""
+    budgets: Dict[str, int] = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        query_type, sep, tokens = entry.partition("=")
+        if not sep or not query_type.strip() or not tokens.strip().isdigit():
+            raise ValueError(f"Invalid token budget '{entry.strip()}', expected query_type=tokens")
+        budgets[query_type.strip()] = int(tokens)
+    return budgets
+
+
+class CompiledTemplate:
+    """Prompt template pre-split into literal text and placeholders"""
+
+    def __init__(self, template: str):
+        self.segments: List[Tuple[str, Optional[str]]] = [
+            (literal, field_name) for literal, field_name, _, _ in Formatter().parse(template)
+        ]
+
+    def render(self, **values: str) -> str:
+        parts = []
+        for literal, field_name in self.segments:
+            parts.append(literal)
+            if field_name is not None:
+                parts.append(values[field_name])
+        return "".join(parts)
+
+
+def _check_fields(fields: Set[str]) -> None:
+    missing = [name for name in REQUIRED_PLACEHOLDERS if name not in fields]
+    if missing:
+        raise ValueError(f"missing placeholders: {missing}")
+    unknown = sorted(fields - set(REQUIRED_PLACEHOLDERS))
+    if unknown:
+        raise ValueError(f"unknown placeholders: {unknown}")
+
+
+def check_template(text: str) -> None:
+    """Raise ValueError unless the text is a well-formed template with exactly the required placeholders"""
+    _check_fields({field_name for _, field_name, _, _ in Formatter().parse(text) if field_name is not None})
+
+
+def _read_template(path: str) -> Tuple[int, str]:
+    """(mtime_ns, text) of a template file"""
+    # Stat before reading: an edit racing the read shows up as a newer mtime next check
+    mtime_ns = os.stat(path).st_mtime_ns
+    with open(path, 'r', encoding='utf-8') as f:
+        return mtime_ns, f.read().strip()
+
+
+class PromptTemplate:
+    """One validated, compiled version of a template; never modified once built"""
+
+    __slots__ = ("query_type", "text", "compiled", "version", "mtime_ns")
+
+    def __init__(self, query_type: str, text: str, mtime_ns: int = 0):
+        compiled = CompiledTemplate(text)
+        _check_fields({field_name for _, field_name in compiled.segments if field_name is not None})
+        self.query_type = query_type
+        self.text = text
+        self.compiled = compiled
+        # Content hash: changes exactly when the rendered prompts can change
+        self.version = hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+        self.mtime_ns = mtime_ns
+
+    @classmethod
+    def from_file(cls, query_type: str, path: str) -> "PromptTemplate":
+        mtime_ns, text = _read_template(path)
+        return cls(query_type, text, mtime_ns)
+
+
+def _mtime_ns(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
+
+
+class RenderedPrompt:
+    """Formatted prompt plus its size accounting"""
+
+    __slots__ = ("text", "query_type", "prompt_bytes", "prompt_tokens", "context_tokens", "truncated",
+                 "template_version")
+
+    def __init__(self, text: str, query_type: str, context_tokens: int, truncated: bool,
+                 template_version: str = ""):
+        self.text = text
+        self.query_type = query_type
+        self.prompt_bytes = len(text.encode("utf-8"))
+        self.prompt_tokens = estimate_tokens(text)
+        self.context_tokens = context_tokens
+        self.truncated = truncated
+        self.template_version = template_version
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "query_type": self.query_type,
+            "template_version": self.template_version,
+            "prompt_bytes": self.prompt_bytes,
+            "prompt_tokens": self.prompt_tokens,
+            "context_tokens": self.context_tokens,
+            "truncated": self.truncated,
+        }
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _sample_lists(value: Any, sample_size: int) -> Any:
+    """Replace lists longer than sample_size with a leading sample and a summary"""
+    if isinstance(value, dict):
+        return {key: _sample_lists(item, sample_size) for key, item in value.items()}
+    if isinstance(value, list) and len(value) > sample_size:
+        summary: Dict[str, Any] = {
+            "total_count": len(value),
+            "omitted": len(value) - sample_size,
+            "sample": value[:sample_size],
+        }
+        # Column totals keep aggregate figures exact even when rows are dropped
+        if all(isinstance(row, dict) for row in value):
+            totals: Dict[str, Any] = {}
+            for row in value:
+                for key, item in row.items():
+                    if isinstance(item, (int, float)) and not isinstance(item, bool):
+                        totals[key] = totals.get(key, 0) + item
+            summary["column_totals"] = totals
+        return summary
+    return value
+
+
+def _drop_largest(value: Dict[str, Any], prefix: str = "") -> Optional[str]:
+    """Remove the largest entry, descending into nested dicts; returns its dotted path"""
+    keys = [key for key in value if key != "query_type"]
+    if not keys:
+        return None
+    key = max(keys, key=lambda key: len(_dumps(value[key])))
+    child = value[key]
+    if isinstance(child, dict) and 1 < len(child) <= MAX_RECORD_KEYS:
+        return _drop_largest(child, f"{prefix}{key}.")
+    del value[key]
+    return prefix + key
+
+
+def serialize_context(context: Dict, token_budget: int) -> Tuple[str, bool]:
+    """Compact JSON for the context, sampled down to fit the token budget"""
+    text = _dumps(context)
+    if estimate_tokens(text) <= token_budget:
+        return text, False
+    for sample_size in SAMPLE_SIZES:
+        sampled = _sample_lists(context, sample_size)
+        text = _dumps(sampled)
+        if estimate_tokens(text) <= token_budget:
+            return text, True
+    # Still too large: drop whole entries, largest first, so the JSON stays valid
+    omitted: List[str] = []
+    while estimate_tokens(text) > token_budget:
+        path = _drop_largest(sampled)
+        if path is None:
+            break
+        omitted.append(path)
+        text = _dumps({**sampled, "omitted": omitted})
+    return text, True
+
 class PromptManager:
-    """Manages prompt templates for different query types"""
+    """Manages prompt templates for different query types
+
+    Every `*.txt` file in the prompts directory is the template for the
+    query type it is named after. Each file version is validated once when it
+    is discovered, and compiled on first use. Readers never lock: loaded templates live in a dict that is
+    replaced, never modified, so reloads build and validate new versions off
+    to the side and swap them in at once. File mtimes are checked at most
+    every `reload_interval` seconds so edits go live without a restart; an
+    edit that fails validation is logged and the last good version stays.
+    """
     
-    def __init__(self, prompts_dir: str = "prompts"):
-        self.prompts_dir = prompts_dir
-        self.prompt_cache: Dict[str, str] = {}
-        self.load_all_prompts()
+    def __init__(self, prompts_dir: Optional[str] = None, token_budgets: Optional[Dict[str, int]] = None,
+                 default_token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET,
+                 reload_interval: float = PROMPT_RELOAD_INTERVAL_SECONDS):
+        self.prompts_dir = prompts_dir or PROMPTS_DIR
+        self.token_budgets: Dict[str, int] = dict(token_budgets or {})
+        self.default_token_budget = default_token_budget
+        self.reload_interval = reload_interval
+        self.reloads = 0
+        self._fallback_template = PromptTemplate("fallback", self._get_basic_fallback_prompt())
+        # Each of these is replaced wholesale under the lock and read without it
+        self._paths: Dict[str, str] = {}
+        self._templates: Dict[str, PromptTemplate] = {}
+        # Versions that failed validation, (mtime_ns, error); retried once the file changes
+        self._rejected: Dict[str, Tuple[int, str]] = {}
+        # mtime_ns of file versions that passed validation but are not compiled yet
+        self._validated: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        
+        files = self._scan()
+        with self._lock:
+            self._validate_new(files)
+        self._paths = {query_type: path for query_type, (path, _) in files.items()}
+        if files:
+            logger.info(f"Found {len(files)} prompt templates in {self.prompts_dir}")
+        else:
+            logger.warning(f"No prompt templates found in '{self.prompts_dir}'")
     
-    def load_all_prompts(self) -> None:
-        """Load all prompt templates from files into cache"""
+    def _scan(self) -> Dict[str, Tuple[str, int]]:
+        """Template files in the prompts directory: {query_type: (path, mtime_ns)}"""
+        files: Dict[str, Tuple[str, int]] = {}
+        try:
+            entries = list(os.scandir(self.prompts_dir))
+        except OSError:
+            return files
+        for entry in entries:
+            if not entry.name.endswith(TEMPLATE_SUFFIX):
+                continue
+            try:
+                if entry.is_file():
+                    files[entry.name[:-len(TEMPLATE_SUFFIX)]] = (entry.path, entry.stat().st_mtime_ns)
+            except OSError:
+                # Deleted while scanning
+                continue
+        return files
+    
+    def _validate_new(self, files: Dict[str, Tuple[str, int]]) -> None:
+        """Validate file versions not checked before, without compiling them (lock held)"""
+        validated = {query_type: mtime_ns for query_type, mtime_ns in self._validated.items()
+                     if query_type in files and files[query_type][1] == mtime_ns}
+        rejected = dict(self._rejected)
+        for query_type, (path, mtime_ns) in files.items():
+            template = self._templates.get(query_type)
+            if query_type in validated or query_type in rejected or (template and template.mtime_ns == mtime_ns):
+                continue
+            try:
+                mtime_ns, text = _read_template(path)
+                check_template(text)
+            except (OSError, ValueError) as e:
+                rejected[query_type] = (_mtime_ns(path), str(e))
+                logger.error(f"Prompt template '{query_type}' rejected: {e}")
+                continue
+            validated[query_type] = mtime_ns
+        self._validated, self._rejected = validated, rejected
+    
+    def _build(self, query_type: str, path: str) -> Optional[PromptTemplate]:
+        """Read, validate and compile one template file (lock held)"""
+        try:
+            template = PromptTemplate.from_file(query_type, path)
+        except (OSError, ValueError) as e:
+            self._rejected = {**self._rejected, query_type: (_mtime_ns(path), str(e))}
+            logger.error(f"Prompt template '{query_type}' rejected: {e}")
+            return None
+        logger.info(f"Loaded prompt template: {query_type} (version {template.version})")
+        return template
+    
+    def _load(self, query_type: str) -> Optional[PromptTemplate]:
+        """First use of a template"""
+        with self._lock:
+            template = self._templates.get(query_type)
+            path = self._paths.get(query_type)
+            if template is None and path is not None and query_type not in self._rejected:
+                template = self._build(query_type, path)
+                if template is not None:
+                    self._templates = {**self._templates, query_type: template}
+            return template
+    
+    def _refresh(self, eager: bool = False) -> None:
+        """Pick up added, edited and deleted files (lock held)
+
+        Only templates already in use are rebuilt, unless `eager`; the rest
+        still load on first use.
+        """
+        files = self._scan()
+        # A rejection stands only while its file is unchanged
+        self._rejected = {
+            query_type: rejected for query_type, rejected in self._rejected.items()
+            if query_type in files and files[query_type][1] == rejected[0]
+        }
+        self._validate_new(files)
+        current = self._templates
+        templates: Dict[str, PromptTemplate] = {}
+        for query_type, (path, mtime_ns) in files.items():
+            template = current.get(query_type)
+            stale = template is None or template.mtime_ns != mtime_ns
+            if stale and (template is not None or eager) and query_type not in self._rejected:
+                template = self._build(query_type, path) or template
+            if template is not None:
+                templates[query_type] = template
+        
+        changed = sorted(
+            query_type for query_type in set(current) | set(templates)
+            if current.get(query_type) is not templates.get(query_type)
+        )
+        self._templates = templates
+        self._paths = {query_type: path for query_type, (path, _) in files.items()}
+        if changed:
+            self.reloads += 1
+            logger.info(f"Swapped in prompt templates: {', '.join(changed)}")
+    
+    def _maybe_refresh(self) -> None:
+        if self.reload_interval <= 0 or time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        # One caller checks the files; everyone else carries on with the current versions
+        if not self._lock.acquire(blocking=False):
+            return
         try:
-            if not os.path.exists(self.prompts_dir):
-                logger.warning(f"Prompts directory '{self.prompts_dir}' not found")
-                return
-            
-            prompt_files = {
-                'inventory': 'inventory.txt',
-                'sales': 'sales.txt', 
-                'low_stock': 'low_stock.txt',
-                'top_selling': 'top_selling.txt',
-                'overview': 'overview.txt',
-                'default': 'default.txt'
-            }
-            
-            for query_type, filename in prompt_files.items():
-                file_path = os.path.join(self.prompts_dir, filename)
-                if os.path.exists(file_path):
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        self.prompt_cache[query_type] = f.read().strip()
-                    logger.info(f"Loaded prompt template: {query_type}")
-                else:
-                    logger.warning(f"Prompt file not found: {file_path}")
-            
-            logger.info(f"Loaded {len(self.prompt_cache)} prompt templates")
-            
-        except Exception as e:
-            logger.error(f"Error loading prompt templates: {e}")
+            self._checked_at = time.monotonic()
+            self._refresh()
+        finally:
+            self._lock.release()
+    
+    def _lookup(self, query_type: str) -> Optional[PromptTemplate]:
+        template = self._templates.get(query_type)
+        if template is None and query_type in self._paths and query_type not in self._rejected:
+            template = self._load(query_type)
+        return template
+    
+    def get_template(self, query_type: str) -> PromptTemplate:
+        """Current template for a query type, else the default one, else the built-in fallback"""
+        self._maybe_refresh()
+        return self._lookup(query_type) or self._lookup('default') or self._fallback_template
+    
+    def load_all_prompts(self) -> None:
+        """Load every template now instead of on first use"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._refresh(eager=True)
+        logger.info(f"Loaded {len(self._templates)} prompt templates")
     
     def get_prompt(self, query_type: str) -> str:
         """Get prompt template for specified query type"""
-        # Try to get specific prompt
-        if query_type in self.prompt_cache:
-            return self.prompt_cache[query_type]
-        
-        # Fall back to default prompt
-        if 'default' in self.prompt_cache:
-            logger.info(f"Using default prompt for query type: {query_type}")
-            return self.prompt_cache['default']
-        
-        # Ultimate fallback - hardcoded basic prompt
-        logger.warning(f"No prompt found for '{query_type}', using basic fallback")
-        return self._get_basic_fallback_prompt()
+        return self.get_template(query_type).text
+    
+    def get_compiled_prompt(self, query_type: str) -> CompiledTemplate:
+        """Get pre-compiled template for specified query type"""
+        return self.get_template(query_type).compiled
+    
+    def get_version(self, query_type: str) -> str:
+        """Content hash of the template a query type currently renders with"""
+        return self.get_template(query_type).version
+    
+    def get_token_budget(self, query_type: str) -> int:
+        """Context token budget for a query type"""
+        return self.token_budgets.get(query_type, self.default_token_budget)
     
     def _get_basic_fallback_prompt(self) -> str:
         """Basic fallback prompt if no files are available"""
@@ -74,76 +393,77 @@ DATA CONTEXT:
 
 Please provide a helpful, accurate response based on the data provided. Be professional and focus on restaurant operations."""
 
+    def render_prompt(self, query_type: str, query: str, context: Dict) -> RenderedPrompt:
+        """Render the compiled template with a budgeted context and report its size"""
+        template = self.get_template(query_type)
+        context_json, truncated = serialize_context(context, self.get_token_budget(query_type))
+        # Templates are validated when loaded, so only known placeholders remain
+        text = template.compiled.render(query=query, context=context_json)
+        return RenderedPrompt(text, query_type, estimate_tokens(context_json), truncated, template.version)
+    
     def format_prompt(self, query_type: str, query: str, context: Dict) -> str:
         """Format prompt template with actual query and context data"""
-        try:
-            prompt_template = self.get_prompt(query_type)
-            
-            # Format the context as JSON for better structure
-            context_json = json.dumps(context, indent=2, ensure_ascii=False)
-            
-            # Replace placeholders in template
-            formatted_prompt = prompt_template.format(
-                query=query,
-                context=context_json
-            )
-            
-            return formatted_prompt
-            
-        except Exception as e:
-            logger.error(f"Error formatting prompt for {query_type}: {e}")
-            # Return basic formatted prompt as fallback
-            basic_prompt = self._get_basic_fallback_prompt()
-            context_json = json.dumps(context, indent=2, ensure_ascii=False)
-            return basic_prompt.format(query=query, context=context_json)
+        return self.render_prompt(query_type, query, context).text
     
     def reload_prompts(self) -> None:
         """Reload all prompt templates from disk"""
         logger.info("Reloading prompt templates...")
-        self.prompt_cache.clear()
         self.load_all_prompts()
     
     def get_available_prompts(self) -> Dict[str, str]:
-        """Get list of available prompt types and their first few lines"""
+        """Get list of loaded prompt types and their first few lines"""
         result = {}
-        for query_type, prompt in self.prompt_cache.items():
+        for query_type, template in self._templates.items():
             # Get first line as preview
-            first_line = prompt.split('\n')[0][:100]
-            result[query_type] = first_line
+            result[query_type] = template.text.split('\n')[0][:100]
         return result
     
-    def validate_prompts(self) -> Dict[str, bool]:
-        """Validate that all prompt templates have required placeholders"""
-        validation_results = {}
-        required_placeholders = ['{query}', '{context}']
-        
-        for query_type, prompt in self.prompt_cache.items():
-            has_all_placeholders = all(
-                placeholder in prompt for placeholder in required_placeholders
-            )
-            validation_results[query_type] = has_all_placeholders
-            
-            if not has_all_placeholders:
-                missing = [p for p in required_placeholders if p not in prompt]
-                logger.warning(f"Prompt '{query_type}' missing placeholders: {missing}")
-        
-        return validation_results
+    def validate_prompts(self) -> Dict[str, Optional[bool]]:
+        """Validation status of every template: checked once when each file version
+        is discovered, so this is a lookup; None means not checked yet"""
+        templates, validated, rejected = self._templates, self._validated, self._rejected
+        return {
+            query_type: True if query_type in templates or query_type in validated
+            else False if query_type in rejected else None
+            for query_type in sorted(self._paths)
+        }
+    
+    def stats(self) -> Dict[str, Any]:
+        templates = self._templates
+        return {
+            "prompts_dir": self.prompts_dir,
+            "loaded": sorted(templates),
+            "versions": {query_type: template.version for query_type, template in templates.items()},
+            "errors": {query_type: error for query_type, (_, error) in self._rejected.items()},
+            "reloads": self.reloads,
+            "reload_interval_seconds": self.reload_interval,
+        }
 
 # Global prompt manager instance
-prompt_manager = PromptManager()
+prompt_manager = PromptManager(token_budgets=parse_token_budgets(CONTEXT_TOKEN_BUDGETS))
 
 def get_formatted_prompt(query_type: str, query: str, context: Dict) -> str:
     """Convenience function to get formatted prompt"""
     return prompt_manager.format_prompt(query_type, query, context)
 
+def get_rendered_prompt(query_type: str, query: str, context: Dict) -> RenderedPrompt:
+    """Convenience function to get a formatted prompt with size accounting"""
+    return prompt_manager.render_prompt(query_type, query, context)
+
+def get_prompt_version(query_type: str) -> str:
+    """Convenience function to get the current template version, e.g. for cache keys"""
+    return prompt_manager.get_version(query_type)
+
 def reload_prompts() -> None:
     """Convenience function to reload prompts"""
     prompt_manager.reload_prompts()
 
 def get_prompt_info() -> Dict:
-    """Get information about loaded prompts"""
+    """Get information about discovered and loaded prompts"""
+    validation_status = prompt_manager.validate_prompts()
     return {
-        'available_prompts': list(prompt_manager.prompt_cache.keys()),
+        'available_prompts': list(validation_status),
         'prompt_previews': prompt_manager.get_available_prompts(),
-        'validation_status': prompt_manager.validate_prompts()
+        'validation_status': validation_status,
+        **prompt_manager.stats()
     }
@@ -0,0 +1,88 @@
+"""
+Date Range Index for SwiggyBot
+Per-date sales totals kept in date order with cumulative quantity, profit
+and count arrays, so the totals of any date range are two bisects and a
+subtraction instead of a scan over the sales rows
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+
+# (quantity_sold, total_profit, sales_count)
+RangeSums = Tuple[int, float, int]
+
+
+class PrefixSumIndex:
+    """Sorted per-date totals with prefix sums
+
+    Sales for the latest date (the common case) extend the cumulative
+    arrays in O(1); a backdated sale marks them stale and they are rebuilt
+    once, in O(number of dates), on the next query.
+    """
+
+    __slots__ = ("_dates", "_daily", "_cum_quantity", "_cum_profit", "_cum_count", "_stale")
+
+    def __init__(self):
+        self._dates: List[str] = []
+        self._daily: Dict[str, List] = {}
+        self._cum_quantity: List[int] = [0]
+        self._cum_profit: List[float] = [0]
+        self._cum_count: List[int] = [0]
+        self._stale = False
+
+    def add(self, date: str, quantity_sold: int, total_profit: float) -> None:
+        totals = self._daily.get(date)
+        if totals is None:
+            self._daily[date] = [quantity_sold, total_profit, 1]
+            if self._dates and date < self._dates[-1]:
+                insort(self._dates, date)
+                self._stale = True
+                return
+            self._dates.append(date)
+            if not self._stale:
+                self._cum_quantity.append(self._cum_quantity[-1] + quantity_sold)
+                self._cum_profit.append(self._cum_profit[-1] + total_profit)
+                self._cum_count.append(self._cum_count[-1] + 1)
+            return
+
+        totals[0] += quantity_sold
+        totals[1] += total_profit
+        totals[2] += 1
+        if date == self._dates[-1] and not self._stale:
+            self._cum_quantity[-1] += quantity_sold
+            self._cum_profit[-1] += total_profit
+            self._cum_count[-1] += 1
+        else:
+            self._stale = True
+
+    def _rebuild(self) -> None:
+        quantity, profit, count = [0], [0], [0]
+        for date in self._dates:
+            day_quantity, day_profit, day_count = self._daily[date]
+            quantity.append(quantity[-1] + day_quantity)
+            profit.append(profit[-1] + day_profit)
+            count.append(count[-1] + day_count)
+        self._cum_quantity, self._cum_profit, self._cum_count = quantity, profit, count
+        self._stale = False
+
+    def range(self, start: Optional[str] = None, end: Optional[str] = None) -> RangeSums:
+        """Totals for dates in [start, end]; None leaves that side open"""
+        if self._stale:
+            self._rebuild()
+        low = 0 if start is None else bisect_left(self._dates, start)
+        high = len(self._dates) if end is None else bisect_right(self._dates, end)
+        if high <= low:
+            return 0, 0, 0
+        return (
+            self._cum_quantity[high] - self._cum_quantity[low],
+            self._cum_profit[high] - self._cum_profit[low],
+            self._cum_count[high] - self._cum_count[low],
+        )
+
+    @property
+    def first_date(self) -> Optional[str]:
+        return self._dates[0] if self._dates else None
+
+    @property
+    def last_date(self) -> Optional[str]:
+        return self._dates[-1] if self._dates else None
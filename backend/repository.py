@@ -0,0 +1,257 @@
+"""
+Repository Interface for SwiggyBot
+Row types and the storage contract every backend (in-memory, SQLite)
+implements for the database helpers in main.py
+"""
+
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+
+# Listener signature: (change, item_name) where change is "inventory" or "sales"
+ChangeListener = Callable[[str, str], None]
+
+
+class InventoryItem:
+    """Single inventory row"""
+
+    __slots__ = ("item_name", "quantity_left", "unit_price")
+
+    def __init__(self, item_name: str, quantity_left: int, unit_price: float):
+        self.item_name = item_name
+        self.quantity_left = quantity_left
+        self.unit_price = unit_price
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "item_name": self.item_name,
+            "quantity_left": self.quantity_left,
+            "unit_price": self.unit_price,
+        }
+
+
+class ItemSalesTotal:
+    """Running sold/profit counters for one item"""
+
+    __slots__ = ("item_name", "total_sold", "total_profit")
+
+    def __init__(self, item_name: str):
+        self.item_name = item_name
+        self.total_sold = 0
+        self.total_profit = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "item_name": self.item_name,
+            "total_sold": self.total_sold,
+            "total_profit": self.total_profit,
+        }
+
+
+class SaleRecord:
+    """Single sales row"""
+
+    __slots__ = ("date", "item_name", "quantity_sold", "total_profit")
+
+    def __init__(self, date: str, item_name: str, quantity_sold: int, total_profit: float):
+        self.date = date
+        self.item_name = item_name
+        self.quantity_sold = quantity_sold
+        self.total_profit = total_profit
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "date": self.date,
+            "item_name": self.item_name,
+            "quantity_sold": self.quantity_sold,
+            "total_profit": self.total_profit,
+        }
+
+
+class RangeTotals:
+    """Sales totals over an inclusive date range"""
+
+    __slots__ = ("start_date", "end_date", "quantity_sold", "total_profit", "sales_count")
+
+    def __init__(self, start_date: Optional[str], end_date: Optional[str],
+                 quantity_sold: int, total_profit: float, sales_count: int):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.quantity_sold = quantity_sold
+        self.total_profit = total_profit
+        self.sales_count = sales_count
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "quantity_sold": self.quantity_sold,
+            "total_profit": self.total_profit,
+            "sales_count": self.sales_count,
+        }
+
+
+class InventoryError(ValueError):
+    """Base error for rejected inventory or sales writes"""
+
+
+class UnknownItemError(InventoryError):
+    """The item is not on the menu"""
+
+
+class InsufficientStockError(InventoryError):
+    """A sale asks for more units than are left"""
+
+
+# One rejected row of a bulk write: (row index within the batch, reason)
+RowError = Tuple[int, str]
+
+
+def normalize_item_name(item_name: str) -> str:
+    """Case-folded key used by the item index"""
+    return item_name.strip().casefold()
+
+
+class Repository(ABC):
+    """Storage contract for inventory and sales data
+
+    Every mutation bumps `version` and notifies registered change listeners,
+    which lets derived indexes keep up with the data.
+    """
+
+    def __init__(self):
+        self._version = 0
+        self._listeners: List[ChangeListener] = []
+
+    # Change notification
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def add_listener(self, listener: ChangeListener) -> None:
+        """Register a callback invoked after every data change; registering twice is a no-op"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _notify(self, change: str, item_name: str) -> None:
+        self._version += 1
+        for listener in self._listeners:
+            listener(change, item_name)
+
+    def load(self, inventory: Optional[List[Dict[str, Any]]] = None,
+             sales: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Insert inventory and sales rows given as dicts"""
+        for item in inventory or []:
+            self.upsert_item(item["item_name"], item["quantity_left"], item["unit_price"])
+        for sale in sales or []:
+            self.add_sale(sale["date"], sale["item_name"], sale["quantity_sold"], sale["total_profit"])
+
+    def is_empty(self) -> bool:
+        """True when there are neither items nor sales"""
+        return self.item_count == 0 and self.sale_count == 0
+
+    def seed_if_empty(self, inventory: Optional[List[Dict[str, Any]]] = None,
+                      sales: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """Load the rows only when the repository holds no data; returns whether it did"""
+        if not self.is_empty():
+            return False
+        self.load(inventory, sales)
+        return True
+
+    # Inventory
+    @abstractmethod
+    def upsert_item(self, item_name: str, quantity_left: int, unit_price: float) -> InventoryItem:
+        """Insert a new inventory item or replace an existing one"""
+
+    @abstractmethod
+    def get_item(self, item_name: str) -> Optional[InventoryItem]:
+        """Case-insensitive lookup of one item"""
+
+    @abstractmethod
+    def items(self) -> List[InventoryItem]:
+        """All inventory items"""
+
+    @abstractmethod
+    def items_below(self, threshold: int) -> List[InventoryItem]:
+        """Items with quantity_left strictly below threshold, lowest stock first"""
+
+    @abstractmethod
+    def restock(self, item_name: str, quantity: int, unit_price: Optional[float] = None) -> InventoryItem:
+        """Add units to an item; new items need a unit_price"""
+
+    @abstractmethod
+    def set_threshold(self, item_name: str, threshold: int) -> None:
+        """Set the low-stock threshold of one item"""
+
+    @abstractmethod
+    def thresholds(self) -> Dict[str, int]:
+        """Low-stock thresholds set so far, by case-folded item name"""
+
+    def upsert_items_bulk(self, rows: Iterable[Dict[str, Any]]) -> List[RowError]:
+        """Insert or replace many items; returns the rejected rows"""
+        errors = []
+        for index, row in enumerate(rows):
+            try:
+                self.upsert_item(row["item_name"], row["quantity_left"], row["unit_price"])
+            except (KeyError, InventoryError) as e:
+                errors.append((index, str(e)))
+        return errors
+
+    # Sales
+    @abstractmethod
+    def record_sale(self, date: str, item_name: str, quantity_sold: int,
+                    total_profit: Optional[float] = None) -> Tuple[SaleRecord, InventoryItem]:
+        """Atomically decrement stock and record the sale
+
+        total_profit defaults to quantity_sold * unit_price. Raises
+        UnknownItemError or InsufficientStockError without changing anything.
+        """
+
+    @abstractmethod
+    def record_sales_bulk(self, rows: List[Dict[str, Any]]) -> List[RowError]:
+        """Record a batch of sales atomically per row; returns the rejected rows"""
+
+    @abstractmethod
+    def add_sale(self, date: str, item_name: str, quantity_sold: int, total_profit: float) -> SaleRecord:
+        """Record one historical sales row without touching stock"""
+
+    @abstractmethod
+    def sales(self) -> List[SaleRecord]:
+        """All sales rows"""
+
+    @abstractmethod
+    def sales_on(self, date: str) -> List[SaleRecord]:
+        """Sales rows for one date"""
+
+    @abstractmethod
+    def total_profit(self) -> float:
+        """Profit across all dates"""
+
+    @abstractmethod
+    def profit_on(self, date: str) -> float:
+        """Profit for one date"""
+
+    @abstractmethod
+    def top_selling(self, limit: Optional[int] = None) -> List[ItemSalesTotal]:
+        """Per-item sales totals ordered by quantity sold, highest first"""
+
+    @abstractmethod
+    def latest_sale_date(self) -> Optional[str]:
+        """Most recent date with sales, None when there are none"""
+
+    @abstractmethod
+    def totals_between(self, start: Optional[str], end: Optional[str]) -> RangeTotals:
+        """Sales totals for dates in [start, end]; None leaves that side open"""
+
+    @abstractmethod
+    def item_totals_between(self, start: Optional[str], end: Optional[str]) -> List[ItemSalesTotal]:
+        """Per-item sales totals for dates in [start, end], highest quantity first"""
+
+    @property
+    @abstractmethod
+    def item_count(self) -> int:
+        """Number of inventory items"""
+
+    @property
+    @abstractmethod
+    def sale_count(self) -> int:
+        """Number of sales rows"""
@@ -0,0 +1,98 @@
+"""
+Resilience Helpers for SwiggyBot
+Jittered exponential backoff, a rolling latency window for hedging
+decisions and a circuit breaker for upstream model calls
+"""
+
+import math
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: Callable[[], float] = random.random) -> float:
+    """Full-jitter backoff: uniform in [0, min(cap, base * 2^(attempt-1))]"""
+    return rng() * min(cap, base * 2 ** (attempt - 1))
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Nearest-rank percentile, or None until min_samples calls were seen"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """Stops calling an upstream that keeps failing
+
+    Opens after `failure_threshold` consecutive failures. Once `reset_seconds`
+    have passed one probe call is let through (half-open): success closes
+    the circuit, failure opens it again. A probe that never reports back
+    (e.g. cancelled) is replaced after another `reset_seconds`.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened = 0
+        self._changed_at = 0.0
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; may turn an open circuit half-open"""
+        if self.state == BREAKER_CLOSED:
+            return True
+        now = self._clock()
+        if now - self._changed_at < self.reset_seconds:
+            return False
+        self.state = BREAKER_HALF_OPEN
+        self._changed_at = now
+        return True
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are being refused"""
+        return self.state != BREAKER_CLOSED and self._clock() - self._changed_at < self.reset_seconds
+
+    def record_success(self) -> None:
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == BREAKER_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != BREAKER_OPEN:
+                self.opened += 1
+            self.state = BREAKER_OPEN
+            self._changed_at = self._clock()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+            "times_opened": self.opened,
+        }
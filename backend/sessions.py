@@ -0,0 +1,192 @@
+"""
+Conversation Sessions for SwiggyBot
+Server-side multi-turn state: a bounded history whose older turns are
+folded into one-line summaries, the last resolved query spec (and small
+contexts) for follow-ups, and an LRU store that evicts idle sessions
+"""
+
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from date_ranges import MONTHS
+from prompt_manager import CHARS_PER_TOKEN, estimate_tokens
+
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "6"))
+SESSION_HISTORY_TOKEN_BUDGET = int(os.getenv("SESSION_HISTORY_TOKEN_BUDGET", "400"))
+
+# Per-turn and per-summary size caps keep a session's memory bounded
+MAX_QUERY_CHARS = 300
+MAX_ANSWER_CHARS = 600
+SUMMARY_PART_CHARS = 60
+MAX_SUMMARY_LINES = 10
+# Larger contexts (full inventory, long sales lists) are rebuilt from the spec instead of kept
+MAX_CACHED_CONTEXT_CHARS = 4096
+
+# Lead-ins of follow-up questions; they carry no intent of their own
+# (the "out" in "about" would otherwise read as a low-stock question)
+_FOLLOW_UP_LEAD = re.compile(
+    r"^\s*(?:(?:and|also|ok|okay|so)\b[\s,]*)?(?:(?:what|how)\s+about|same\s+for)\b", re.IGNORECASE
+)
+_WORD = re.compile(r"[a-z0-9]+")
+# Words a bare reference to an item or date range ("and pasta?", "yesterday then?") may contain
+_REFERENCE_WORDS = {
+    "and", "also", "the", "for", "on", "in", "of", "from", "since", "during", "then", "now", "please", "ok", "okay", "so",
+    "today", "tonight", "yesterday", "day", "days", "week", "weeks", "month", "months", "year", "years",
+    "this", "current", "last", "past", "previous", "before", "to", "till", "until", "through", "between",
+    "st", "nd", "rd", "th",
+} | set(MONTHS)
+
+
+class Turn:
+    """One question and answer"""
+
+    __slots__ = ("query", "answer", "query_type")
+
+    def __init__(self, query: str, answer: str, query_type: str):
+        self.query = query[:MAX_QUERY_CHARS]
+        self.answer = answer[:MAX_ANSWER_CHARS]
+        self.query_type = query_type
+
+    def summary(self) -> str:
+        return f"[{self.query_type}] {self.query[:SUMMARY_PART_CHARS]} -> {self.answer[:SUMMARY_PART_CHARS]}"
+
+
+class Session:
+    """State of one conversation"""
+
+    def __init__(self, session_id: str, max_turns: int = SESSION_MAX_TURNS):
+        self.session_id = session_id
+        self.max_turns = max_turns
+        self.turns: Deque[Turn] = deque()
+        self.summary: Deque[str] = deque(maxlen=MAX_SUMMARY_LINES)
+        self.turn_count = 0
+        self.last_spec: Optional[Tuple] = None
+        self.last_context: Optional[Dict[str, Any]] = None
+        self.last_version: Optional[int] = None
+        self.last_seen = time.monotonic()
+        # Turns of one session run one at a time
+        self.lock = asyncio.Lock()
+
+    def add_turn(self, query: str, answer: str, spec: Tuple, context: Dict[str, Any], version: int) -> None:
+        self.turns.append(Turn(query, answer, spec[0]))
+        while len(self.turns) > self.max_turns:
+            # Older turns survive only as one-line summaries
+            self.summary.append(self.turns.popleft().summary())
+        self.turn_count += 1
+        self.last_spec = spec
+        self.last_context = context if _context_chars(context) <= MAX_CACHED_CONTEXT_CHARS else None
+        self.last_version = version
+
+    def cached_context(self, spec: Tuple, version: int) -> Optional[Dict[str, Any]]:
+        """The previous turn's context if it was kept and answers the same spec on unchanged data"""
+        if spec == self.last_spec and version == self.last_version:
+            return self.last_context
+        return None
+
+    def history_text(self, token_budget: int = SESSION_HISTORY_TOKEN_BUDGET) -> str:
+        """Summaries and recent turns, oldest dropped first to fit the token budget"""
+        parts = []
+        if self.summary:
+            parts.append("Earlier: " + " | ".join(self.summary))
+        parts.extend(f"User: {turn.query}\nAssistant: {turn.answer}" for turn in self.turns)
+        text = "\n".join(parts)
+        while len(parts) > 1 and estimate_tokens(text) > token_budget:
+            parts.pop(0)
+            text = "\n".join(parts)
+        if estimate_tokens(text) > token_budget:
+            text = "..." + text[-token_budget * CHARS_PER_TOKEN + 3:]
+        return text
+
+    def prompt_query(self, query: str, token_budget: int = SESSION_HISTORY_TOKEN_BUDGET) -> str:
+        """The question prefixed with the conversation so far"""
+        history = self.history_text(token_budget)
+        if not history:
+            return query
+        return f"CONVERSATION SO FAR:\n{history}\n\nCURRENT QUESTION: {query}"
+
+
+def _context_chars(context: Dict[str, Any]) -> int:
+    return len(json.dumps(context, separators=(",", ":"), default=str))
+
+
+def strip_follow_up(query: str) -> Tuple[str, bool]:
+    """Drop a follow-up lead-in ("and what about pasta?" -> "pasta?"); returns (rest, stripped)"""
+    rest = _FOLLOW_UP_LEAD.sub("", query, count=1).strip()
+    if rest and rest != query.strip():
+        return rest, True
+    return query, False
+
+
+def is_bare_reference(query: str, item_name: Optional[str]) -> bool:
+    """True when the query names an item and/or dates and nothing else ("pasta?", "and yesterday?")"""
+    words = set(_WORD.findall(query.lower()))
+    if item_name:
+        words -= set(_WORD.findall(item_name.lower()))
+    return all(word in _REFERENCE_WORDS or word.isdigit() for word in words)
+
+
+class SessionStore:
+    """Sessions by id, least recently used first; idle ones expire"""
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, ttl_seconds: float = SESSION_TTL_SECONDS,
+                 max_turns: int = SESSION_MAX_TURNS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, session_id: str) -> Session:
+        """The session with this id, created on first use"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(session_id, self.max_turns)
+                self.created += 1
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_seen = now
+            return session
+
+    def _expire(self, now: float) -> None:
+        # Least recently used sessions sit at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_seen < self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "max_turns": self.max_turns,
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,319 @@
+"""
+SQLite Storage Backend for SwiggyBot
+Persistent repository shared by multiple uvicorn workers: WAL journaling,
+indexes on item and date, a pooled set of connections and aggregate queries
+pushed down into SQL
+"""
+
+import logging
+import queue
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from repository import (
+    InsufficientStockError, InventoryError, InventoryItem, ItemSalesTotal, RangeTotals,
+    Repository, RowError, SaleRecord, UnknownItemError, normalize_item_name
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inventory (
+    item_key TEXT PRIMARY KEY,
+    item_name TEXT NOT NULL,
+    quantity_left INTEGER NOT NULL,
+    unit_price NUMERIC NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_inventory_quantity ON inventory (quantity_left);
+CREATE TABLE IF NOT EXISTS sales (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    item_name TEXT NOT NULL,
+    quantity_sold INTEGER NOT NULL,
+    total_profit NUMERIC NOT NULL
+);
+-- Covering index: per-date lookups and date range aggregates never touch the table rows
+CREATE INDEX IF NOT EXISTS idx_sales_date_totals ON sales (date, item_key, quantity_sold, total_profit);
+CREATE INDEX IF NOT EXISTS idx_sales_item ON sales (item_key);
+-- Low-stock thresholds live with the data so every worker uses the same ones
+CREATE TABLE IF NOT EXISTS thresholds (
+    item_key TEXT PRIMARY KEY,
+    threshold INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+"""
+
+# Statements are fixed strings so sqlite3's per-connection statement cache
+# keeps them prepared across calls
+UPSERT_ITEM = (
+    "INSERT INTO inventory (item_key, item_name, quantity_left, unit_price) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(item_key) DO UPDATE SET quantity_left = excluded.quantity_left, unit_price = excluded.unit_price"
+)
+SELECT_ITEM = "SELECT item_name, quantity_left, unit_price FROM inventory WHERE item_key = ?"
+SELECT_ITEMS = "SELECT item_name, quantity_left, unit_price FROM inventory ORDER BY rowid"
+SELECT_ITEMS_BELOW = (
+    "SELECT item_name, quantity_left, unit_price FROM inventory WHERE quantity_left < ? ORDER BY quantity_left, item_key"
+)
+UPSERT_THRESHOLD = (
+    "INSERT INTO thresholds (item_key, threshold) VALUES (?, ?) "
+    "ON CONFLICT(item_key) DO UPDATE SET threshold = excluded.threshold"
+)
+SELECT_THRESHOLDS = "SELECT item_key, threshold FROM thresholds"
+SET_QUANTITY = "UPDATE inventory SET quantity_left = ? WHERE item_key = ?"
+INSERT_SALE = "INSERT INTO sales (date, item_key, item_name, quantity_sold, total_profit) VALUES (?, ?, ?, ?, ?)"
+SELECT_SALES = "SELECT date, item_name, quantity_sold, total_profit FROM sales ORDER BY id"
+SELECT_SALES_ON = "SELECT date, item_name, quantity_sold, total_profit FROM sales WHERE date = ? ORDER BY id"
+SUM_PROFIT = "SELECT COALESCE(SUM(total_profit), 0) FROM sales"
+SUM_PROFIT_ON = "SELECT COALESCE(SUM(total_profit), 0) FROM sales WHERE date = ?"
+TOP_SELLING = (
+    "SELECT MIN(item_name), SUM(quantity_sold) AS sold, SUM(total_profit) FROM sales "
+    "GROUP BY item_key ORDER BY sold DESC, item_key LIMIT ?"
+)
+LATEST_SALE_DATE = "SELECT MAX(date) FROM sales"
+SUM_RANGE = (
+    "SELECT COALESCE(SUM(quantity_sold), 0), COALESCE(SUM(total_profit), 0), COUNT(*) FROM sales "
+    "WHERE date BETWEEN ? AND ?"
+)
+ITEM_TOTALS_RANGE = (
+    "SELECT MIN(item_name), SUM(quantity_sold) AS sold, SUM(total_profit) FROM sales "
+    "WHERE date BETWEEN ? AND ? GROUP BY item_key ORDER BY sold DESC, item_key"
+)
+# Open range bounds; ISO dates sort between them
+MIN_DATE = ""
+MAX_DATE = "9999-12-31"
+COUNT_ITEMS = "SELECT COUNT(*) FROM inventory"
+COUNT_SALES = "SELECT COUNT(*) FROM sales"
+BUMP_VERSION = "UPDATE meta SET value = value + 1 WHERE key = 'version'"
+SELECT_VERSION = "SELECT value FROM meta WHERE key = 'version'"
+
+
+def _total(row) -> ItemSalesTotal:
+    totals = ItemSalesTotal(row[0])
+    totals.total_sold = row[1]
+    totals.total_profit = row[2]
+    return totals
+
+
+class SQLiteRepository(Repository):
+    """Repository stored in an SQLite database file"""
+
+    def __init__(self, path: str, pool_size: int = 4, pool_timeout: float = 10.0):
+        super().__init__()
+        self.path = path
+        self.pool_timeout = pool_timeout
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+        logger.info(f"Opened SQLite repository at {path} (pool={pool_size})")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256,
+                               isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._pool.get(timeout=self.pool_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No SQLite connection free after {self.pool_timeout:.1f}s")
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute(BUMP_VERSION)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _scalar(self, sql: str, params: tuple = ()) -> Any:
+        with self._connection() as conn:
+            return conn.execute(sql, params).fetchone()[0]
+
+    def _rows(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def close(self) -> None:
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+    # Change notification
+    @property
+    def version(self) -> int:
+        """Shared across processes: bumped inside every write transaction"""
+        return self._scalar(SELECT_VERSION)
+
+    def seed_if_empty(self, inventory: Optional[List[Dict[str, Any]]] = None,
+                      sales: Optional[List[Dict[str, Any]]] = None) -> bool:
+        # Workers start together; the emptiness check and the inserts share one
+        # write transaction so only the first of them seeds
+        with self._transaction() as conn:
+            if conn.execute(COUNT_ITEMS).fetchone()[0] or conn.execute(COUNT_SALES).fetchone()[0]:
+                return False
+            conn.executemany(UPSERT_ITEM, [
+                (normalize_item_name(item["item_name"]), item["item_name"], item["quantity_left"], item["unit_price"])
+                for item in inventory or []
+            ])
+            conn.executemany(INSERT_SALE, [
+                (sale["date"], normalize_item_name(sale["item_name"]), sale["item_name"],
+                 sale["quantity_sold"], sale["total_profit"])
+                for sale in sales or []
+            ])
+        logger.info(f"Seeded SQLite repository with {len(inventory or [])} items and {len(sales or [])} sales")
+        return True
+
+    # Inventory
+    def upsert_item(self, item_name: str, quantity_left: int, unit_price: float) -> InventoryItem:
+        with self._transaction() as conn:
+            conn.execute(UPSERT_ITEM, (normalize_item_name(item_name), item_name, quantity_left, unit_price))
+        self._notify("inventory", item_name)
+        return self.get_item(item_name)
+
+    def upsert_items_bulk(self, rows: Iterable[Dict[str, Any]]) -> List[RowError]:
+        errors, params = [], []
+        for index, row in enumerate(rows):
+            try:
+                params.append((normalize_item_name(row["item_name"]), row["item_name"],
+                               row["quantity_left"], row["unit_price"]))
+            except KeyError as e:
+                errors.append((index, f"Missing field {e}"))
+        if params:
+            with self._transaction() as conn:
+                conn.executemany(UPSERT_ITEM, params)
+            for row in params:
+                self._notify("inventory", row[1])
+        return errors
+
+    def restock(self, item_name: str, quantity: int, unit_price: Optional[float] = None) -> InventoryItem:
+        key = normalize_item_name(item_name)
+        with self._transaction() as conn:
+            row = conn.execute(SELECT_ITEM, (key,)).fetchone()
+            if row is None:
+                if unit_price is None:
+                    raise UnknownItemError(f"Unknown item '{item_name}'; a unit_price is needed to add it")
+                item = InventoryItem(item_name, quantity, unit_price)
+            else:
+                item = InventoryItem(row[0], row[1] + quantity, row[2] if unit_price is None else unit_price)
+            conn.execute(UPSERT_ITEM, (key, item.item_name, item.quantity_left, item.unit_price))
+        self._notify("inventory", item.item_name)
+        return item
+
+    def get_item(self, item_name: str) -> Optional[InventoryItem]:
+        rows = self._rows(SELECT_ITEM, (normalize_item_name(item_name),))
+        return InventoryItem(*rows[0]) if rows else None
+
+    def items(self) -> List[InventoryItem]:
+        return [InventoryItem(*row) for row in self._rows(SELECT_ITEMS)]
+
+    def items_below(self, threshold: int) -> List[InventoryItem]:
+        return [InventoryItem(*row) for row in self._rows(SELECT_ITEMS_BELOW, (threshold,))]
+
+    def set_threshold(self, item_name: str, threshold: int) -> None:
+        with self._transaction() as conn:
+            conn.execute(UPSERT_THRESHOLD, (normalize_item_name(item_name), threshold))
+        self._notify("threshold", item_name)
+
+    def thresholds(self) -> Dict[str, int]:
+        return dict(self._rows(SELECT_THRESHOLDS))
+
+    # Sales
+    def _record_sale(self, conn, date: str, item_name: str, quantity_sold: int,
+                     total_profit: Optional[float]) -> Tuple[SaleRecord, InventoryItem]:
+        """Check and decrement stock, then insert the sale; caller holds the write transaction"""
+        if quantity_sold <= 0:
+            raise InventoryError("quantity_sold must be positive")
+        key = normalize_item_name(item_name)
+        row = conn.execute(SELECT_ITEM, (key,)).fetchone()
+        if row is None:
+            raise UnknownItemError(f"Unknown item '{item_name}'")
+        name, quantity_left, unit_price = row
+        if quantity_sold > quantity_left:
+            raise InsufficientStockError(f"Only {quantity_left} {name} left, cannot sell {quantity_sold}")
+        profit = quantity_sold * unit_price if total_profit is None else total_profit
+        conn.execute(SET_QUANTITY, (quantity_left - quantity_sold, key))
+        conn.execute(INSERT_SALE, (date, key, name, quantity_sold, profit))
+        return SaleRecord(date, name, quantity_sold, profit), InventoryItem(name, quantity_left - quantity_sold, unit_price)
+
+    def record_sale(self, date: str, item_name: str, quantity_sold: int,
+                    total_profit: Optional[float] = None) -> Tuple[SaleRecord, InventoryItem]:
+        # BEGIN IMMEDIATE takes the write lock up front, so the stock check and
+        # decrement cannot interleave with another worker's sale
+        with self._transaction() as conn:
+            sale, item = self._record_sale(conn, date, item_name, quantity_sold, total_profit)
+        self._notify("inventory", item.item_name)
+        self._notify("sales", item.item_name)
+        return sale, item
+
+    def record_sales_bulk(self, rows: List[Dict[str, Any]]) -> List[RowError]:
+        errors, accepted = [], []
+        with self._transaction() as conn:
+            for index, row in enumerate(rows):
+                try:
+                    sale, _ = self._record_sale(conn, row["date"], row["item_name"],
+                                                row["quantity_sold"], row.get("total_profit"))
+                    accepted.append(sale.item_name)
+                except InventoryError as e:
+                    errors.append((index, str(e)))
+        for item_name in accepted:
+            self._notify("inventory", item_name)
+            self._notify("sales", item_name)
+        return errors
+
+    def add_sale(self, date: str, item_name: str, quantity_sold: int, total_profit: float) -> SaleRecord:
+        with self._transaction() as conn:
+            conn.execute(INSERT_SALE, (date, normalize_item_name(item_name), item_name, quantity_sold, total_profit))
+        self._notify("sales", item_name)
+        return SaleRecord(date, item_name, quantity_sold, total_profit)
+
+    def sales(self) -> List[SaleRecord]:
+        return [SaleRecord(*row) for row in self._rows(SELECT_SALES)]
+
+    def sales_on(self, date: str) -> List[SaleRecord]:
+        return [SaleRecord(*row) for row in self._rows(SELECT_SALES_ON, (date,))]
+
+    def total_profit(self) -> float:
+        return self._scalar(SUM_PROFIT)
+
+    def profit_on(self, date: str) -> float:
+        return self._scalar(SUM_PROFIT_ON, (date,))
+
+    def top_selling(self, limit: Optional[int] = None) -> List[ItemSalesTotal]:
+        return [_total(row) for row in self._rows(TOP_SELLING, (-1 if limit is None else limit,))]
+
+    def latest_sale_date(self) -> Optional[str]:
+        return self._scalar(LATEST_SALE_DATE)
+
+    def totals_between(self, start: Optional[str], end: Optional[str]) -> RangeTotals:
+        quantity, profit, count = self._rows(SUM_RANGE, (start or MIN_DATE, end or MAX_DATE))[0]
+        return RangeTotals(start, end, quantity, profit, count)
+
+    def item_totals_between(self, start: Optional[str], end: Optional[str]) -> List[ItemSalesTotal]:
+        return [_total(row) for row in self._rows(ITEM_TOTALS_RANGE, (start or MIN_DATE, end or MAX_DATE))]
+
+    @property
+    def item_count(self) -> int:
+        return self._scalar(COUNT_ITEMS)
+
+    @property
+    def sale_count(self) -> int:
+        return self._scalar(COUNT_SALES)
@@ -0,0 +1,236 @@
+"""
+Indexed In-Memory Store for SwiggyBot
+Keeps inventory and sales rows in compact slotted records with hash, date
+and quantity indexes so lookups do not scan the whole dataset. Sales
+aggregates are maintained incrementally as sales are recorded.
+"""
+
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Any, List, Optional, Tuple
+
+from range_index import PrefixSumIndex
+from repository import (
+    InsufficientStockError, InventoryError, InventoryItem, ItemSalesTotal, RangeTotals,
+    Repository, RowError, SaleRecord, UnknownItemError, normalize_item_name
+)
+
+
+class InMemoryStore(Repository):
+    """Inventory and sales data with lookup indexes
+
+    - item index: case-folded item_name -> InventoryItem (O(1))
+    - date index: date -> list of SaleRecord (O(1) per date)
+    - stock index: sorted (quantity_left, key) pairs for threshold queries (O(log n))
+    - sales aggregates: running total, per-date totals and per-item counters
+      with a (-total_sold, key) ordered index for top sellers
+    - range indexes: per-date prefix sums overall and per item, so date
+      range totals take O(log d) for d distinct dates
+
+    Writes hold a re-entrant lock so stock checks, decrements and the derived
+    indexes change together under concurrent requests.
+    """
+
+    def __init__(self, inventory: Optional[List[Dict[str, Any]]] = None,
+                 sales: Optional[List[Dict[str, Any]]] = None):
+        super().__init__()
+        self._items: Dict[str, InventoryItem] = {}
+        self._stock_index: List[Tuple[int, str]] = []
+        self._thresholds: Dict[str, int] = {}
+        self._sales: List[SaleRecord] = []
+        self._sales_by_date: Dict[str, List[SaleRecord]] = {}
+        self._total_profit = 0
+        self._profit_by_date: Dict[str, float] = {}
+        self._item_totals: Dict[str, ItemSalesTotal] = {}
+        self._top_index: List[Tuple[int, str]] = []
+        self._range_index = PrefixSumIndex()
+        self._item_range_index: Dict[str, PrefixSumIndex] = {}
+        self._lock = threading.RLock()
+        self.load(inventory, sales)
+
+    # Inventory
+    def upsert_item(self, item_name: str, quantity_left: int, unit_price: float) -> InventoryItem:
+        """Insert a new inventory item or replace an existing one"""
+        key = normalize_item_name(item_name)
+        with self._lock:
+            existing = self._items.get(key)
+            if existing is not None:
+                self._set_quantity(existing, key, quantity_left)
+                existing.unit_price = unit_price
+                item = existing
+            else:
+                item = InventoryItem(item_name, quantity_left, unit_price)
+                self._items[key] = item
+                insort(self._stock_index, (quantity_left, key))
+            self._notify("inventory", item.item_name)
+            return item
+
+    def _set_quantity(self, item: InventoryItem, key: str, quantity_left: int) -> None:
+        self._stock_index.pop(bisect_left(self._stock_index, (item.quantity_left, key)))
+        item.quantity_left = quantity_left
+        insort(self._stock_index, (quantity_left, key))
+
+    def restock(self, item_name: str, quantity: int, unit_price: Optional[float] = None) -> InventoryItem:
+        with self._lock:
+            item = self.get_item(item_name)
+            if item is None:
+                if unit_price is None:
+                    raise UnknownItemError(f"Unknown item '{item_name}'; a unit_price is needed to add it")
+                item = self.upsert_item(item_name, quantity, unit_price)
+            else:
+                item = self.upsert_item(item.item_name, item.quantity_left + quantity,
+                                        item.unit_price if unit_price is None else unit_price)
+            return InventoryItem(item.item_name, item.quantity_left, item.unit_price)
+
+    def set_threshold(self, item_name: str, threshold: int) -> None:
+        with self._lock:
+            self._thresholds[normalize_item_name(item_name)] = threshold
+            self._notify("threshold", item_name)
+
+    def thresholds(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._thresholds)
+
+    # Readers copy under the lock: writers run on other threads and update
+    # items, totals and the sorted indexes in several steps
+    def get_item(self, item_name: str) -> Optional[InventoryItem]:
+        with self._lock:
+            item = self._items.get(normalize_item_name(item_name))
+            return _copy_item(item) if item else None
+
+    def items(self) -> List[InventoryItem]:
+        with self._lock:
+            return [_copy_item(item) for item in self._items.values()]
+
+    def items_below(self, threshold: int) -> List[InventoryItem]:
+        """Items with quantity_left strictly below threshold, lowest stock first"""
+        with self._lock:
+            end = bisect_left(self._stock_index, (threshold, ""))
+            return [_copy_item(self._items[key]) for _, key in self._stock_index[:end]]
+
+    # Sales
+    def record_sale(self, date: str, item_name: str, quantity_sold: int,
+                    total_profit: Optional[float] = None) -> Tuple[SaleRecord, InventoryItem]:
+        if quantity_sold <= 0:
+            raise InventoryError("quantity_sold must be positive")
+        key = normalize_item_name(item_name)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                raise UnknownItemError(f"Unknown item '{item_name}'")
+            if quantity_sold > item.quantity_left:
+                raise InsufficientStockError(
+                    f"Only {item.quantity_left} {item.item_name} left, cannot sell {quantity_sold}"
+                )
+            self._set_quantity(item, key, item.quantity_left - quantity_sold)
+            self._notify("inventory", item.item_name)
+            profit = quantity_sold * item.unit_price if total_profit is None else total_profit
+            sale = self.add_sale(date, item.item_name, quantity_sold, profit)
+            return sale, InventoryItem(item.item_name, item.quantity_left, item.unit_price)
+
+    def record_sales_bulk(self, rows: List[Dict[str, Any]]) -> List[RowError]:
+        errors = []
+        # Each row takes the lock on its own so chats are not held up for a whole chunk
+        for index, row in enumerate(rows):
+            try:
+                self.record_sale(row["date"], row["item_name"], row["quantity_sold"], row.get("total_profit"))
+            except InventoryError as e:
+                errors.append((index, str(e)))
+        return errors
+
+    def add_sale(self, date: str, item_name: str, quantity_sold: int, total_profit: float) -> SaleRecord:
+        """Append a sales row, index it by date and update the aggregates"""
+        with self._lock:
+            return self._add_sale(date, item_name, quantity_sold, total_profit)
+
+    def _add_sale(self, date: str, item_name: str, quantity_sold: int, total_profit: float) -> SaleRecord:
+        sale = SaleRecord(date, item_name, quantity_sold, total_profit)
+        self._sales.append(sale)
+        self._sales_by_date.setdefault(date, []).append(sale)
+
+        self._total_profit += total_profit
+        self._profit_by_date[date] = self._profit_by_date.get(date, 0) + total_profit
+
+        key = normalize_item_name(item_name)
+        totals = self._item_totals.get(key)
+        if totals is None:
+            totals = self._item_totals[key] = ItemSalesTotal(item_name)
+        else:
+            self._top_index.pop(bisect_left(self._top_index, (-totals.total_sold, key)))
+        totals.total_sold += quantity_sold
+        totals.total_profit += total_profit
+        insort(self._top_index, (-totals.total_sold, key))
+
+        self._range_index.add(date, quantity_sold, total_profit)
+        item_index = self._item_range_index.get(key)
+        if item_index is None:
+            item_index = self._item_range_index[key] = PrefixSumIndex()
+        item_index.add(date, quantity_sold, total_profit)
+        self._notify("sales", item_name)
+        return sale
+
+    # Sale records are never changed once appended, so list copies suffice
+    def sales(self) -> List[SaleRecord]:
+        with self._lock:
+            return list(self._sales)
+
+    def sales_on(self, date: str) -> List[SaleRecord]:
+        with self._lock:
+            return list(self._sales_by_date.get(date, []))
+
+    def total_profit(self) -> float:
+        with self._lock:
+            return self._total_profit
+
+    def profit_on(self, date: str) -> float:
+        with self._lock:
+            return self._profit_by_date.get(date, 0)
+
+    def top_selling(self, limit: Optional[int] = None) -> List[ItemSalesTotal]:
+        """Per-item sales totals ordered by quantity sold, highest first"""
+        with self._lock:
+            entries = self._top_index if limit is None else self._top_index[:limit]
+            return [_copy_totals(self._item_totals[key]) for _, key in entries]
+
+    def latest_sale_date(self) -> Optional[str]:
+        with self._lock:
+            return self._range_index.last_date
+
+    def totals_between(self, start: Optional[str], end: Optional[str]) -> RangeTotals:
+        # The lock covers the lazy rebuild after backdated sales
+        with self._lock:
+            quantity, profit, count = self._range_index.range(start, end)
+        return RangeTotals(start, end, quantity, profit, count)
+
+    def item_totals_between(self, start: Optional[str], end: Optional[str]) -> List[ItemSalesTotal]:
+        """Per-item totals from each item's prefix sums, O(items * log d)"""
+        results = []
+        with self._lock:
+            for key, index in self._item_range_index.items():
+                quantity, profit, count = index.range(start, end)
+                if count:
+                    totals = ItemSalesTotal(self._item_totals[key].item_name)
+                    totals.total_sold = quantity
+                    totals.total_profit = profit
+                    results.append(totals)
+        results.sort(key=lambda totals: (-totals.total_sold, normalize_item_name(totals.item_name)))
+        return results
+
+    @property
+    def item_count(self) -> int:
+        return len(self._items)
+
+    @property
+    def sale_count(self) -> int:
+        return len(self._sales)
+
+
+def _copy_item(item: InventoryItem) -> InventoryItem:
+    return InventoryItem(item.item_name, item.quantity_left, item.unit_price)
+
+
+def _copy_totals(totals: ItemSalesTotal) -> ItemSalesTotal:
+    copy = ItemSalesTotal(totals.item_name)
+    copy.total_sold = totals.total_sold
+    copy.total_profit = totals.total_profit
+    return copy
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for Swiggy Chatbot
+Microbenchmarks of the data and prompt layers on synthetic datasets, and an
+in-process load test of /chat against a fake Gemini model. Results are
+saved as JSON so runs can be compared with --compare.
+
+    python benchmark.py micro --sizes 1000,100000,1000000
+    python benchmark.py load --requests 2000 --concurrency 64 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.append(BACKEND_DIR)
+
+import main
+from fake_model import FakeGenerativeModel
+from llm_client import AsyncLLMClient
+from prompt_manager import prompt_manager
+from response_cache import ResponseCache
+from repository import Repository
+from store import InMemoryStore
+
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+MENU = ["Burger", "Pizza", "Fries", "Sandwich", "Pasta", "Salad"]
+
+BENCH_QUERIES = {
+    "inventory_item": "How many burgers are left?",
+    "inventory_all": "Show me all inventory",
+    "sales_today": "What's today's profit?",
+    "sales_all": "What are total sales?",
+    "low_stock": "Which items are running low?",
+    "top_selling": "What are the top selling items?",
+    "overview": "How is the restaurant doing?",
+}
+LOAD_QUERIES = [
+    "How many burgers are left?",
+    "What's today's profit?",
+    "Which items are running low?",
+    "What are my best selling items?",
+    "Should I restock pizza before the weekend?",
+    "How is the restaurant doing?",
+]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], seconds: float) -> Dict[str, Any]:
+    """Throughput and latency percentiles (milliseconds) of a run"""
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "seconds": round(seconds, 4),
+        "ops_per_second": round(len(ordered) / seconds, 1) if seconds > 0 else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 4) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4) if ordered else 0.0,
+    }
+
+
+def time_calls(fn: Callable[[], Any], min_seconds: float, min_calls: int = 5, max_calls: int = 100000) -> Dict[str, Any]:
+    """Call fn repeatedly for at least min_seconds and min_calls"""
+    latencies = []
+    started_at = time.perf_counter()
+    while len(latencies) < max_calls:
+        call_started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_started)
+        if len(latencies) >= min_calls and time.perf_counter() - started_at >= min_seconds:
+            break
+    return summarize(latencies, sum(latencies))
+
+
+# Synthetic data
+def synthetic_store(rows: int, items: int, days: int, seed: int = 42) -> InMemoryStore:
+    """Store with `items` menu items and `rows` sales spread over `days` days"""
+    rng = random.Random(seed)
+    names = MENU + [f"Dish {i:05d}" for i in range(max(0, items - len(MENU)))]
+    names = names[:items]
+    inventory = [
+        {"item_name": name, "quantity_left": rng.randint(0, 200), "unit_price": rng.choice((60, 90, 120, 180, 250))}
+        for name in names
+    ]
+    store = InMemoryStore(inventory)
+    first_day = date(2025, 9, 9) - timedelta(days=days - 1)
+    dates = [(first_day + timedelta(days=d)).isoformat() for d in range(days)]
+    for i in range(rows):
+        quantity = rng.randint(1, 20)
+        item = inventory[rng.randrange(items)]
+        # Spread rows evenly over the dates so the latest date always has sales
+        store.add_sale(dates[i * days // rows], item["item_name"], quantity, quantity * item["unit_price"])
+    return store
+
+
+def use_store(store: Repository) -> None:
+    """Point the app's helpers, intent matcher and low-stock index at a benchmark store
+
+    The app's change listener is registered on the store, so writes through
+    the API keep the matcher and index in step as they do for the app's own store.
+    """
+    main.db = store
+    store.add_listener(main._on_data_change)
+    main.intent_matcher.set_catalog(item.item_name for item in store.items())
+    main.low_stock_index.load(store.items(), store.thresholds())
+    main._derived_version = store.version
+
+
+# Microbenchmarks
+def run_micro(sizes: List[int], min_seconds: float, items: int, days: int) -> Dict[str, Any]:
+    results = []
+    for rows in sizes:
+        print(f"🔄 Building synthetic store: {rows:,} sales rows, {items} items, {days} days...")
+        started_at = time.perf_counter()
+        store = synthetic_store(rows, items, days)
+        build_seconds = time.perf_counter() - started_at
+        use_store(store)
+        print(f"   built in {build_seconds:.2f}s")
+
+        cases: Dict[str, Callable[[], Any]] = {}
+        for name, query in BENCH_QUERIES.items():
+            cases[f"search_database_context[{name}]"] = lambda query=query: main.search_database_context(query)
+        cases["get_top_selling_items[all]"] = lambda: main.get_top_selling_items()
+        cases["get_top_selling_items[5]"] = lambda: main.get_top_selling_items(5)
+        for name in ("inventory_item", "sales_all", "overview"):
+            query = BENCH_QUERIES[name]
+            context = main.search_database_context(query)
+            cases[f"format_prompt[{name}]"] = (
+                lambda query=query, context=context:
+                prompt_manager.format_prompt(context["query_type"], query, context)
+            )
+
+        for case, fn in cases.items():
+            stats = time_calls(fn, min_seconds)
+            stats.update({"benchmark": case, "rows": rows})
+            results.append(stats)
+            print(f"   {case:<44} p50={stats['p50_ms']:>10.4f}ms p99={stats['p99_ms']:>10.4f}ms "
+                  f"{stats['ops_per_second']:>12,.1f} ops/s")
+    return {"kind": "micro", "items": items, "days": days, "results": results}
+
+
+# End-to-end load test
+class ASGIClient:
+    """Drives the ASGI app in process, without sockets or an HTTP client library"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        body = json.dumps(payload).encode("utf-8")
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": b"", "root_path": "",
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+        }
+        finished = asyncio.Event()
+        sent_body = False
+        response = {"status": None, "body": bytearray(), "first_byte": None}
+        started_at = time.perf_counter()
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # The client stays connected until the response is complete
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                if response["first_byte"] is None and message.get("body"):
+                    response["first_byte"] = time.perf_counter() - started_at
+                response["body"] += message.get("body", b"")
+                if not message.get("more_body", False):
+                    finished.set()
+
+        await self.app(scope, receive, send)
+        finished.set()
+        response["seconds"] = time.perf_counter() - started_at
+        return response
+
+
+async def _drive_load(requests: int, concurrency: int, stream: bool, unique: bool) -> Dict[str, Any]:
+    client = ASGIClient(main.app)
+    path = "/chat/stream" if stream else "/chat"
+    latencies: List[float] = []
+    first_bytes: List[float] = []
+    statuses: Dict[str, int] = {}
+    paths: Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            query = LOAD_QUERIES[i % len(LOAD_QUERIES)]
+            if unique:
+                # Distinct wording defeats the response cache
+                query = f"{query} (request {i})"
+            response = await client.post(path, {"message": query})
+            latencies.append(response["seconds"])
+            if response["first_byte"] is not None:
+                first_bytes.append(response["first_byte"])
+            statuses[str(response["status"])] = statuses.get(str(response["status"]), 0) + 1
+            if response["status"] == 200 and not stream:
+                answer_path = json.loads(response["body"])["path"]
+                paths[answer_path] = paths.get(answer_path, 0) + 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, time.perf_counter() - started_at)
+    result["time_to_first_byte"] = summarize(first_bytes, 1.0)
+    result["statuses"] = statuses
+    if paths:
+        result["paths"] = paths
+    return result
+
+
+def run_load(requests: int, concurrency: int, latency: float, chunk_latency: float,
+             stream: bool, unique: bool, cache: bool, fast_path: bool, rows: int,
+             failure_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 0.0,
+             hedge_percentile: float = 0.0) -> Dict[str, Any]:
+    if rows:
+        use_store(synthetic_store(rows, len(MENU), 30))
+    model = FakeGenerativeModel(latency=latency, chunk_latency=chunk_latency, failure_rate=failure_rate,
+                                slow_rate=slow_rate, slow_latency=slow_latency, seed=1)
+    main.FAST_PATH_ENABLED = fast_path
+    main.response_cache = ResponseCache() if cache else ResponseCache(max_entries=0)
+
+    async def run():
+        # The client's semaphore belongs to this event loop
+        main.llm_client = AsyncLLMClient(model, hedge_percentile=hedge_percentile)
+        result = await _drive_load(requests, concurrency, stream, unique)
+        result["model"] = main.llm_client.stats()
+        return result
+
+    print(f"🔄 Driving {'/chat/stream' if stream else '/chat'}: {requests} requests, "
+          f"concurrency {concurrency}, fake model latency {latency * 1000:.0f}ms...")
+    result = asyncio.run(run())
+    result.update({
+        "kind": "load", "endpoint": "/chat/stream" if stream else "/chat",
+        "requests": requests, "concurrency": concurrency, "model_latency": latency,
+        "chunk_latency": chunk_latency, "unique_queries": unique, "cache": cache,
+        "fast_path": fast_path, "rows": rows or main.db.sale_count, "model_calls": model.calls,
+        "coalesced": main.chat_flight.coalesced, "failure_rate": failure_rate, "slow_rate": slow_rate,
+        "slow_latency": slow_latency, "hedge_percentile": hedge_percentile, "model_failures": model.failures,
+    })
+    print(f"   {result['ops_per_second']:,.1f} req/s  p50={result['p50_ms']:.2f}ms  "
+          f"p95={result['p95_ms']:.2f}ms  p99={result['p99_ms']:.2f}ms  statuses={result['statuses']}")
+    return result
+
+
+# Result files
+def compare(current: Dict[str, Any], baseline_path: str) -> None:
+    """Print p50/p99 and throughput changes against a previous result file"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def rows_of(run):
+        if run["kind"] == "micro":
+            return {(r["benchmark"], r["rows"]): r for r in run["results"]}
+        return {(run["endpoint"], run["requests"]): run}
+
+    previous = rows_of(baseline)
+    print(f"\n📊 Compared with {baseline_path} ({baseline.get('timestamp', 'unknown time')})")
+    for key, stats in rows_of(current).items():
+        before = previous.get(key)
+        if before is None:
+            continue
+        changes = []
+        for field in ("p50_ms", "p99_ms", "ops_per_second"):
+            if before[field]:
+                changes.append(f"{field} {100 * (stats[field] - before[field]) / before[field]:+.1f}%")
+        print(f"   {key[0]} @ {key[1]:,}: " + ", ".join(changes))
+
+
+def save(result: Dict[str, Any], output: str) -> None:
+    result["timestamp"] = datetime.now().isoformat(timespec="seconds")
+    result["python"] = platform.python_version()
+    result["platform"] = platform.platform()
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\n💾 Results saved to {output}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="JSON result file (default: benchmark-<kind>-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous JSON result file to compare against")
+    commands = parser.add_subparsers(dest="kind", required=True)
+
+    micro = commands.add_parser("micro", help="Microbenchmarks of search, top sellers and prompt formatting")
+    micro.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated sales row counts, up to 10000000")
+    micro.add_argument("--items", type=int, default=500, help="Menu items in the synthetic dataset")
+    micro.add_argument("--days", type=int, default=365, help="Days the synthetic sales are spread over")
+    micro.add_argument("--min-seconds", type=float, default=0.5, help="Minimum measuring time per benchmark")
+
+    load = commands.add_parser("load", help="End-to-end load test of /chat with a fake Gemini model")
+    load.add_argument("--requests", type=int, default=1000)
+    load.add_argument("--concurrency", type=int, default=32)
+    load.add_argument("--latency", type=float, default=0.2, help="Fake model round trip in seconds")
+    load.add_argument("--chunk-latency", type=float, default=0.0, help="Delay between streamed chunks")
+    load.add_argument("--stream", action="store_true", help="Drive /chat/stream instead of /chat")
+    load.add_argument("--unique", action="store_true", help="Make every query distinct to defeat the cache")
+    load.add_argument("--no-cache", action="store_true", help="Disable the response cache")
+    load.add_argument("--no-fast-path", action="store_true", help="Send fact lookups to the model too")
+    load.add_argument("--rows", type=int, default=0, help="Use a synthetic store with this many sales rows")
+    load.add_argument("--failure-rate", type=float, default=0.0, help="Share of model calls that fail")
+    load.add_argument("--slow-rate", type=float, default=0.0, help="Share of model calls taking --slow-latency")
+    load.add_argument("--slow-latency", type=float, default=0.0, help="Round trip of slow model calls in seconds")
+    load.add_argument("--hedge-percentile", type=float, default=0.0,
+                      help="Hedge model calls slower than this latency percentile (0 disables)")
+    return parser.parse_args(argv)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.kind == "micro":
+        sizes = [int(float(size)) for size in args.sizes.split(",") if size.strip()]
+        return run_micro(sizes, args.min_seconds, args.items, args.days)
+    return run_load(args.requests, args.concurrency, args.latency, args.chunk_latency, args.stream,
+                    args.unique, not args.no_cache, not args.no_fast_path, args.rows,
+                    args.failure_rate, args.slow_rate, args.slow_latency, args.hedge_percentile)
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Keep request logging out of the measurements
+    logging.disable(logging.INFO)
+    print("🚀 Swiggy Chatbot Benchmark\n")
+    result = run(args)
+    output = args.output or os.path.join(
+        os.path.dirname(BACKEND_DIR), f"benchmark-{args.kind}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    save(result, output)
+    if args.compare:
+        compare(result, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
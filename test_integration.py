@@ -6,11 +6,39 @@ Tests the complete flow without requiring API keys
 
 import os
 import sys
+import time
+import asyncio
+import tempfile
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
 
 # Add backend to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
 
-from main import search_database_context, generate_llm_response
+import main as backend
+from main import app, search_database_context, generate_llm_response
+from store import InMemoryStore
+from sqlite_store import SQLiteRepository
+from repository import InsufficientStockError
+from ingest import import_sales
+from fake_model import FakeGenerativeModel, FakeModelError
+from google.api_core.exceptions import PermissionDenied
+from llm_client import AsyncLLMClient, CircuitOpenError, LLMTimeoutError
+from resilience import CircuitBreaker
+from response_cache import ResponseCache
+from intent_matcher import IntentMatcher
+from prompt_manager import PromptManager, estimate_tokens, parse_token_budgets, serialize_context
+from answer_router import is_fact_lookup, render_demo_response
+from metrics import Metric, MetricsRegistry
+from date_ranges import InvalidDate, parse_date_range
+from single_flight import SingleFlight
+from low_stock import AlertBroker, LowStockIndex
+from repository import InventoryItem
+from payloads import project_context
+from sessions import SessionStore
+from datetime import date
+from benchmark import ASGIClient, percentile, summarize, synthetic_store, use_store
 
 def test_database_functions():
     """Test database helper functions"""
@@ -33,6 +61,288 @@ def test_database_functions():
     
     print("✅ All database functions working correctly!\n")
 
+def test_indexed_store():
+    """Test indexed lookups of the in-memory store"""
+    print("🔄 Testing Indexed Store...")
+    
+    store = InMemoryStore(
+        [{"item_name": "Burger", "quantity_left": 24, "unit_price": 120},
+         {"item_name": "Pasta", "quantity_left": 8, "unit_price": 180}],
+        [{"date": "2025-09-09", "item_name": "Burger", "quantity_sold": 15, "total_profit": 1800}]
+    )
+    
+    assert store.get_item("bUrGeR").quantity_left == 24
+    assert [item.item_name for item in store.items_below(10)] == ["Pasta"]
+    store.upsert_item("Burger", 5, 120)
+    assert [item.item_name for item in store.items_below(10)] == ["Burger", "Pasta"]
+    assert len(store.sales_on("2025-09-09")) == 1
+    assert store.sales_on("2025-09-08") == []
+    
+    # Aggregates are updated as sales are recorded
+    store.add_sale("2025-09-10", "Pasta", 20, 3600)
+    assert store.total_profit() == 5400
+    assert store.profit_on("2025-09-10") == 3600
+    assert [t.item_name for t in store.top_selling()] == ["Pasta", "Burger"]
+    store.add_sale("2025-09-10", "burger", 10, 1200)
+    assert [t.to_dict() for t in store.top_selling(1)] == [
+        {"item_name": "Burger", "total_sold": 25, "total_profit": 3000}
+    ]
+    
+    print("✅ Indexed store lookups working correctly!\n")
+
+def test_sqlite_repository():
+    """Test the SQLite backend answers like the in-memory store"""
+    print("🔄 Testing SQLite Repository...")
+    
+    inventory = [{"item_name": "Burger", "quantity_left": 24, "unit_price": 120},
+                 {"item_name": "Pasta", "quantity_left": 8, "unit_price": 180}]
+    sales = [{"date": "2025-09-09", "item_name": "Burger", "quantity_sold": 15, "total_profit": 1800},
+             {"date": "2025-09-08", "item_name": "Pasta", "quantity_sold": 20, "total_profit": 3600}]
+    memory = InMemoryStore(inventory, sales)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "test.db")
+        # Workers starting together seed the shared file exactly once
+        workers = [SQLiteRepository(path, pool_size=1) for _ in range(4)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            seeded = list(pool.map(lambda repo: repo.seed_if_empty(inventory, sales), workers))
+        assert seeded.count(True) == 1
+        for repo in workers:
+            repo.close()
+        sqlite = SQLiteRepository(path, pool_size=2)
+        assert (sqlite.item_count, sqlite.sale_count) == (2, 2)
+        seeded_memory = InMemoryStore()
+        assert seeded_memory.seed_if_empty(inventory, sales) and not seeded_memory.seed_if_empty(inventory, sales)
+        assert (seeded_memory.item_count, seeded_memory.sale_count) == (2, 2)
+        # A request waits a bounded time for a pooled connection
+        busy = SQLiteRepository(path, pool_size=1, pool_timeout=0.05)
+        with busy._connection():
+            try:
+                busy.item_count
+                assert False, "expected a pool timeout"
+            except TimeoutError:
+                pass
+        busy.close()
+        
+        for repo in (memory, sqlite):
+            assert repo.get_item("pasta").to_dict() == {"item_name": "Pasta", "quantity_left": 8, "unit_price": 180}
+        assert [i.item_name for i in sqlite.items_below(10)] == [i.item_name for i in memory.items_below(10)]
+        assert sqlite.total_profit() == memory.total_profit() == 5400
+        assert sqlite.profit_on("2025-09-09") == memory.profit_on("2025-09-09") == 1800
+        assert [t.to_dict() for t in sqlite.top_selling()] == [t.to_dict() for t in memory.top_selling()]
+        
+        version = sqlite.version
+        sqlite.upsert_item("Burger", 5, 120)
+        assert sqlite.version == version + 1
+        assert [i.item_name for i in sqlite.items_below(10)] == ["Burger", "Pasta"]
+        sqlite.close()
+    
+    print("✅ SQLite repository working correctly!\n")
+
+def test_concurrent_sales_and_import():
+    """Test atomic stock decrements under concurrency and chunked CSV import"""
+    print("🔄 Testing Concurrent Sales & Bulk Import...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite = SQLiteRepository(os.path.join(tmp, "test.db"), pool_size=4)
+        for repo in (InMemoryStore(), sqlite):
+            repo.upsert_item("Pizza", 100, 250)
+            
+            def sell(_):
+                try:
+                    repo.record_sale("2025-09-10", "Pizza", 1)
+                    return True
+                except InsufficientStockError:
+                    return False
+            
+            def read():
+                # Readers running alongside the writers only ever see whole sales
+                for _ in range(50):
+                    assert all(t.total_profit == t.total_sold * 250 for t in repo.top_selling())
+                    stock = [item.quantity_left for item in repo.items_below(1000)]
+                    assert stock == sorted(stock) and all(0 <= quantity <= 100 for quantity in stock)
+                    assert sum(sale.quantity_sold for sale in repo.sales_on("2025-09-10")) <= 100
+            
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                readers = [pool.submit(read) for _ in range(2)]
+                sold = sum(pool.map(sell, range(150)))
+                for reader in readers:
+                    reader.result()
+            # Exactly the available stock is sold, never more
+            assert sold == 100
+            assert repo.get_item("pizza").quantity_left == 0
+            assert repo.profit_on("2025-09-10") == 100 * 250
+            assert [t.total_sold for t in repo.top_selling(1)] == [100]
+            
+            repo.restock("Pizza", 10)
+            data = "date,item_name,quantity_sold\n" + "2025-09-11,Pizza,1\n" * 12 + "2025-09-11,Pizza,oops\n" + "Sept 11,Pizza,1\n"
+            result = import_sales(repo, io.BytesIO(data.encode()), "csv", chunk_size=5)
+            assert (result["rows"], result["accepted"], result["rejected"]) == (14, 10, 4)
+            assert repo.get_item("pizza").quantity_left == 0
+        sqlite.close()
+    
+    # Sale dates must be ISO dates
+    response = asyncio.run(ASGIClient(app).post("/sales", {"item_name": "Burger", "quantity_sold": 1, "date": "Sept 10"}))
+    assert response["status"] == 422
+    
+    print(f"✅ Imported at {result['rows_per_second']} rows/s")
+    print("✅ Concurrent sales and bulk import working correctly!\n")
+
+def test_sales_date_ranges():
+    """Test date range parsing and prefix-sum range totals on both backends"""
+    print("🔄 Testing Sales Date Ranges...")
+    
+    today = date(2025, 9, 9)
+    cases = {
+        "What's today's profit?": ("2025-09-09", "2025-09-09"),
+        "profit last week": ("2025-09-01", "2025-09-07"),
+        "sales between Sept 1 and 15": ("2025-09-01", "2025-09-15"),
+        "revenue from 2025-08-30 to 2025-09-02": ("2025-08-30", "2025-09-02"),
+        "sales in the last 7 days": ("2025-09-03", "2025-09-09"),
+        "earnings last month": ("2025-08-01", "2025-08-31"),
+        "profit since Sept 1": ("2025-09-01", "2025-09-09"),
+        "sales from 2025-08-30": ("2025-08-30", "2025-09-09"),
+        "revenue since august": ("2025-08-01", "2025-09-09"),
+        "burger sales from sept 1 to 5": ("2025-09-01", "2025-09-05"),
+        "profit for march 2024": ("2024-03-01", "2024-03-31"),
+        "profit in sep 2024": ("2024-09-01", "2024-09-30"),
+        "sales in 2024": ("2024-01-01", "2024-12-31"),
+        "sales on sept 1 2024": ("2024-09-01", "2024-09-01"),
+        "sales on 3rd march, 2024": ("2024-03-03", "2024-03-03"),
+        "revenue from dec 20 to jan 5 2024": ("2023-12-20", "2024-01-05"),
+        "profit since march 2024": ("2024-03-01", "2025-09-09"),
+    }
+    for query, expected in cases.items():
+        date_range = parse_date_range(query, today)
+        assert (date_range.start.isoformat(), date_range.end.isoformat()) == expected, query
+        print(f"✅ '{query}' -> {expected[0]} .. {expected[1]}")
+    assert parse_date_range("What are total sales?", today) is None
+    assert parse_date_range("profit from burgers", today) is None
+    assert parse_date_range("sales of 1500 units", today) is None
+    # Dates that do not exist are flagged rather than read as "no dates"
+    for query in ("sales on sept 31", "profit for feb 29 2025", "sales in the last 0 days"):
+        assert isinstance(parse_date_range(query, today), InvalidDate), query
+    
+    sales = [{"date": "2025-09-09", "item_name": "Burger", "quantity_sold": 15, "total_profit": 1800},
+             {"date": "2025-09-07", "item_name": "Pizza", "quantity_sold": 5, "total_profit": 1250},
+             {"date": "2025-09-08", "item_name": "Burger", "quantity_sold": 20, "total_profit": 2400}]
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite = SQLiteRepository(os.path.join(tmp, "test.db"), pool_size=2)
+        for repo in (InMemoryStore(), sqlite):
+            # Backdated rows land out of order in the prefix-sum index
+            repo.load([], sales)
+            assert repo.latest_sale_date() == "2025-09-09"
+            totals = repo.totals_between("2025-09-07", "2025-09-08")
+            assert (totals.quantity_sold, totals.total_profit, totals.sales_count) == (25, 3650, 2)
+            assert repo.totals_between(None, None).total_profit == 5450
+            assert repo.totals_between("2025-09-10", None).sales_count == 0
+            repo.add_sale("2025-09-09", "Pizza", 1, 250)
+            assert [t.to_dict() for t in repo.item_totals_between("2025-09-08", "2025-09-09")] == [
+                {"item_name": "Burger", "total_sold": 35, "total_profit": 4200},
+                {"item_name": "Pizza", "total_sold": 1, "total_profit": 250},
+            ]
+        sqlite.close()
+    
+    context = search_database_context("Show profit between Sept 7 and 8")
+    assert context["data"]["total_profit"] == 1080 + 2400 + 1250
+    assert "all_sales" not in context["data"]
+    
+    # An invalid date gets no all-time totals and an explicit answer
+    context = search_database_context("What was the profit on sept 31?")
+    assert context["data"] == {"period": "invalid date", "invalid_date": "day is out of range for month"}
+    assert not is_fact_lookup("What was the profit on sept 31?", context)
+    assert "couldn't work out the dates" in render_demo_response("What was the profit on sept 31?", context)
+    
+    print("✅ Sales date ranges working correctly!\n")
+
+def test_low_stock_alerts():
+    """Test per-item thresholds, crossing detection and alert fan-out"""
+    print("🔄 Testing Low-Stock Alerts...")
+    
+    index = LowStockIndex(default_threshold=10)
+    index.load([InventoryItem("Burger", 24, 120), InventoryItem("Pasta", 8, 180), InventoryItem("Fries", 40, 60)])
+    assert [item["item_name"] for item in index.low_items()] == ["Pasta"]
+    
+    # Only threshold crossings raise alerts
+    assert index.update(InventoryItem("Burger", 12, 120)) is None
+    alert = index.update(InventoryItem("Burger", 9, 120))
+    assert alert["event"] == "low_stock" and alert["item_name"] == "Burger"
+    assert index.update(InventoryItem("Burger", 5, 120)) is None
+    assert index.update(InventoryItem("Pasta", 30, 180))["event"] == "restocked"
+    assert index.set_threshold("fries", 50)["event"] == "low_stock"
+    # Least headroom first: Fries is 10 under its threshold, Burger 5
+    assert [(item["item_name"], item["threshold"]) for item in index.low_items()] == [("Fries", 50), ("Burger", 10)]
+    
+    async def run():
+        broker = AlertBroker(queue_size=2)
+        queue = broker.subscribe()
+        # Writers publish from worker threads
+        await asyncio.get_running_loop().run_in_executor(None, broker.publish, alert)
+        received = await asyncio.wait_for(queue.get(), 1.0)
+        broker.unsubscribe(queue)
+        return received, broker.subscriber_count
+    
+    received, subscribers = asyncio.run(run())
+    assert received is alert and subscribers == 0
+    
+    context = search_database_context("Which items are running low?")
+    assert context["data"] == backend.low_stock_index.low_items()
+    assert all(item["quantity_left"] < item["threshold"] for item in context["data"])
+    
+    # Single-item answers judge stock against the item's own threshold
+    burger = backend.db.get_item("Burger")
+    try:
+        backend.db.set_threshold("Burger", burger.quantity_left + 1)
+        context = search_database_context("How many burgers are left?")
+        assert context["data"]["threshold"] == burger.quantity_left + 1 and context["data"]["is_low"]
+        assert "Running low" in render_demo_response("How many burgers are left?", context)
+    finally:
+        backend.db.set_threshold("Burger", backend.low_stock_index.default_threshold)
+    assert "Stock looks good" in render_demo_response("How many burgers are left?", search_database_context("How many burgers are left?"))
+    
+    # With SQLite, writes and thresholds from another worker reach this one's answers
+    original = backend.db
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "shared.db")
+        this_worker, other_worker = SQLiteRepository(path, pool_size=1), SQLiteRepository(path, pool_size=1)
+        this_worker.seed_if_empty(backend.SEED_DATA["inventory"], backend.SEED_DATA["sales"])
+        try:
+            use_store(this_worker)
+            other_worker.upsert_item("Samosa", 30, 40)
+            other_worker.set_threshold("Samosa", 50)
+            low = [item["item_name"] for item in search_database_context("Which items are running low?")["data"]]
+            assert "Samosa" in low
+            assert search_database_context("How many samosas are left?")["data"]["item_name"] == "Samosa"
+            
+            # Crossings made by another worker are published when this one syncs
+            async def crossing_from_other_worker():
+                queue = backend.alert_broker.subscribe()
+                try:
+                    other_worker.upsert_item("Samosa", 80, 40)
+                    await backend.run_db(backend.sync_derived_state)
+                    return await asyncio.wait_for(queue.get(), 1.0)
+                finally:
+                    backend.alert_broker.unsubscribe(queue)
+            alert = asyncio.run(crossing_from_other_worker())
+            assert (alert["event"], alert["item_name"], alert["quantity_left"]) == ("restocked", "Samosa", 80)
+        finally:
+            use_store(original)
+            this_worker.close()
+            other_worker.close()
+    
+    # A store swapped in by use_store keeps the derived state in step with its writes
+    store = InMemoryStore([{"item_name": "Burger", "quantity_left": 50, "unit_price": 120}])
+    try:
+        use_store(store)
+        use_store(store)
+        store.upsert_item("Momos", 3, 90)
+        assert [item["item_name"] for item in backend.low_stock_index.low_items()] == ["Momos"]
+        assert search_database_context("How many momos are left?")["data"]["item_name"] == "Momos"
+    finally:
+        use_store(original)
+    
+    print("✅ Low-stock alerts working correctly!\n")
+
 def test_mock_llm_response():
     """Test LLM response generation (without API key)"""
     print("🔄 Testing Mock LLM Response...")
@@ -53,6 +363,547 @@ def test_mock_llm_response():
     print(f"✅ Mock Response: {mock_response}")
     print("✅ LLM integration flow working correctly!\n")
 
+def test_async_llm_client():
+    """Test concurrent, non-blocking model calls against a fake model"""
+    print("🔄 Testing Async LLM Client...")
+    
+    async def run():
+        client = AsyncLLMClient(FakeGenerativeModel(latency=0.05), max_concurrency=50, timeout=1.0)
+        started = time.perf_counter()
+        texts = await asyncio.gather(*(client.generate(f"prompt {i}") for i in range(50)))
+        elapsed = time.perf_counter() - started
+        assert len(texts) == 50 and all(texts)
+        # 50 calls of 50ms would take 2.5s if they ran one at a time
+        assert elapsed < 1.0, elapsed
+        
+        slow_client = AsyncLLMClient(FakeGenerativeModel(latency=1.0), timeout=0.05)
+        try:
+            await slow_client.generate("slow prompt")
+            assert False, "expected a timeout"
+        except LLMTimeoutError:
+            pass
+        return elapsed
+    
+    elapsed = asyncio.run(run())
+    print(f"✅ 50 concurrent fake calls finished in {elapsed:.2f}s")
+    print("✅ Async LLM client working correctly!\n")
+
+def test_resilient_llm_client():
+    """Test retries, deadlines, hedging and the circuit breaker against a faulty fake model"""
+    print("🔄 Testing Resilient LLM Client...")
+    
+    async def run():
+        model = FakeGenerativeModel(fail_first=2)
+        client = AsyncLLMClient(model, backoff_base=0.01)
+        assert await client.generate("prompt") and (model.calls, client.retries) == (3, 2)
+        
+        # Attempts are cut at attempt_timeout and the whole call at timeout
+        slow_client = AsyncLLMClient(FakeGenerativeModel(latency=1.0), timeout=0.3, attempt_timeout=0.1,
+                                     max_attempts=5, backoff_base=0.01)
+        started = time.perf_counter()
+        try:
+            await slow_client.generate("slow prompt")
+            assert False, "expected a timeout"
+        except LLMTimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+        assert elapsed < 0.5 and slow_client.retries >= 1, elapsed
+        
+        # One call in ten takes 200ms; past the p90 a hedge request answers instead
+        hedged = AsyncLLMClient(FakeGenerativeModel(latency=0.005, slow_rate=0.1, slow_latency=0.2, seed=7),
+                                hedge_percentile=90)
+        latencies = []
+        for i in range(80):
+            started = time.perf_counter()
+            await hedged.generate(f"prompt {i}")
+            latencies.append(time.perf_counter() - started)
+        assert hedged.hedges and hedged.hedge_wins
+        assert max(latencies[20:]) < 0.1, max(latencies[20:])
+        
+        failing = FakeGenerativeModel(failure_rate=1.0)
+        breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+        broken = AsyncLLMClient(failing, max_attempts=1, breaker=breaker)
+        for _ in range(3):
+            try:
+                await broken.generate("prompt")
+                assert False, "expected a failure"
+            except FakeModelError:
+                pass
+        try:
+            await broken.generate("prompt")
+            assert False, "expected the breaker to be open"
+        except CircuitOpenError:
+            pass
+        assert failing.calls == 3 and breaker.is_open
+        
+        # Safety-blocked responses and 4xx errors fail the same way every time:
+        # no retry, and the breaker does not count them
+        for error in (ValueError("Response was blocked by safety filters"), PermissionDenied("API key invalid")):
+            def refuse(prompt, error=error):
+                raise error
+            refusing = FakeGenerativeModel(reply=refuse)
+            guarded = AsyncLLMClient(refusing, backoff_base=0.001, breaker=CircuitBreaker(failure_threshold=1))
+            try:
+                await guarded.generate("prompt")
+                assert False, "expected the model error"
+            except type(error):
+                pass
+            assert refusing.calls == 1 and guarded.retries == 0 and not guarded.breaker.is_open
+        return hedged, max(latencies[20:])
+    
+    hedged, worst = asyncio.run(run())
+    print(f"✅ {hedged.hedges} hedges ({hedged.hedge_wins} won), worst latency {worst * 1000:.0f}ms with 200ms slow calls")
+    
+    model = FakeGenerativeModel(failure_rate=1.0)
+    backend.llm_client = AsyncLLMClient(model, max_attempts=2, backoff_base=0.001,
+                                        breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+    try:
+        client = ASGIClient(app)
+        responses = [json.loads(asyncio.run(client.post("/chat", {"message": "Should I restock burgers?"}))["body"])
+                     for _ in range(2)]
+    finally:
+        backend.llm_client = None
+    context = search_database_context("Should I restock burgers?")
+    assert all(r["path"] == "fallback" for r in responses)
+    assert responses[0]["response"] == backend.render_demo_response("Should I restock burgers?", context)
+    # The second request found the breaker open and never reached the model
+    assert model.calls == 2
+    print("✅ Failed or refused model calls fall back to the demo renderer")
+    
+    print("✅ Resilient LLM client working correctly!\n")
+
+def test_streaming_llm_client():
+    """Test that streamed chunks arrive before the full response is generated"""
+    print("🔄 Testing Streaming LLM Client...")
+    
+    async def run():
+        model = FakeGenerativeModel(latency=0.02, chunk_latency=0.02, reply=lambda p: "one two three four five")
+        client = AsyncLLMClient(model, timeout=2.0)
+        started = time.perf_counter()
+        first_chunk_at = None
+        chunks = []
+        async for text in client.stream("prompt"):
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter() - started
+            chunks.append(text)
+        total = time.perf_counter() - started
+        assert "".join(chunks) == "one two three four five"
+        assert first_chunk_at < total / 2
+        return first_chunk_at, total
+    
+    first_chunk_at, total = asyncio.run(run())
+    print(f"✅ Time to first chunk: {first_chunk_at * 1000:.0f}ms of {total * 1000:.0f}ms total")
+    
+    # A model failure before the first delta falls back to the data, as /chat does
+    def fallbacks():
+        return backend.route_stats.stats()["paths"].get("fallback", {}).get("requests", 0)
+    before = fallbacks()
+    backend.llm_client = AsyncLLMClient(FakeGenerativeModel(fail_first=1), timeout=1.0)
+    try:
+        response = asyncio.run(ASGIClient(app).post("/chat/stream", {"message": "Should I restock pizza?"}))
+    finally:
+        backend.llm_client = None
+    body = response["body"].decode()
+    assert "event: error" not in body and "event: delta" in body
+    assert 'event: done\ndata: {"path": "fallback"}' in body
+    assert fallbacks() == before + 1
+    print("✅ Streaming LLM client working correctly!\n")
+
+def test_request_coalescing():
+    """Test that identical concurrent /chat requests share one model call"""
+    print("🔄 Testing Request Coalescing...")
+    
+    async def run():
+        flight = SingleFlight()
+        calls = []
+        
+        async def slow_answer():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+        
+        results = await asyncio.gather(*(flight.do("key", slow_answer) for _ in range(20)))
+        assert len(calls) == 1
+        assert [shared for _, shared in results].count(False) == 1
+        assert flight.stats()["coalesced"] == 19 and flight.stats()["in_flight"] == 0
+        
+        # One caller leaving does not cancel the call for the others
+        first = asyncio.ensure_future(flight.do("other", slow_answer))
+        second = asyncio.ensure_future(flight.do("other", slow_answer))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert (await second) == ("answer", True)
+        
+        model = FakeGenerativeModel(latency=0.05)
+        backend.llm_client = AsyncLLMClient(model)
+        try:
+            client = ASGIClient(app)
+            queries = ["Should I restock pizza?", "should i restock PIZZA"] * 10
+            responses = await asyncio.gather(*(client.post("/chat", {"message": q}) for q in queries))
+        finally:
+            backend.llm_client = None
+            backend.response_cache.clear()
+        assert all(r["status"] == 200 for r in responses)
+        assert model.calls == 1
+        return backend.chat_flight.coalesced
+    
+    coalesced = asyncio.run(run())
+    print(f"✅ 20 identical questions -> 1 model call ({coalesced} coalesced)")
+    print("✅ Request coalescing working correctly!\n")
+
+def test_batch_chat():
+    """Test /chat/batch shares contexts, keeps order and isolates failures"""
+    print("🔄 Testing Batch Chat...")
+    
+    async def run():
+        model = FakeGenerativeModel(latency=0.05)
+        backend.llm_client = AsyncLLMClient(model)
+        try:
+            queries = ["How many burgers are left?", "Should I restock pizza?", "What's today's profit?",
+                       "Which items are running low?", "What are my best selling items?"] * 20
+            response = await ASGIClient(app).post("/chat/batch", {"messages": queries})
+        finally:
+            backend.llm_client = None
+            backend.response_cache.clear()
+        return response, model.calls
+    
+    response, calls = asyncio.run(run())
+    assert response["status"] == 200
+    body = json.loads(response["body"])
+    assert [r["index"] for r in body["results"]] == list(range(100))
+    assert len(body["contexts"]) == 5
+    assert body["contexts"][body["results"][2]["context_id"]]["query_type"] == "sales"
+    assert all(r["error"] is None and r["response"] for r in body["results"])
+    # Two questions need the model; their 40 repeats share those calls
+    assert calls == 2
+    print(f"✅ 100 questions, {len(body['contexts'])} contexts, {calls} model calls in {body['seconds']:.3f}s")
+    
+    original = backend.build_context
+    def failing_build(spec):
+        if spec[0] == "low_stock":
+            raise RuntimeError("boom")
+        return original(spec)
+    backend.build_context = failing_build
+    try:
+        queries = ["Which items are running low?", "How many burgers are left?"]
+        response = asyncio.run(ASGIClient(app).post("/chat/batch", {"messages": queries}))
+    finally:
+        backend.build_context = original
+    results = json.loads(response["body"])["results"]
+    assert "boom" in results[0]["error"] and results[1]["response"]
+    
+    print("✅ Batch chat working correctly!\n")
+
+def test_data_used_projection():
+    """Test none/summary/full projections and pagination of data_used"""
+    print("🔄 Testing data_used Projection...")
+    
+    context = {"query_type": "inventory", "data": [
+        {"item_name": f"Item {i}", "quantity_left": i, "unit_price": 10} for i in range(25)
+    ]}
+    assert project_context(context, "none") is None
+    assert project_context(context, "full") is context
+    assert project_context(context, "summary")["data"] == {
+        "total_count": 25, "column_totals": {"quantity_left": 300, "unit_price": 250}
+    }
+    page = project_context(context, "full", page=3, page_size=10)["data"]
+    assert [row["quantity_left"] for row in page["items"]] == list(range(20, 25))
+    assert (page["total_count"], page["has_more"]) == (25, False)
+    
+    client = ASGIClient(app)
+    full = asyncio.run(client.post("/chat", {"message": "Show me all inventory"}))
+    lean = asyncio.run(client.post("/chat", {"message": "Show me all inventory", "data_used": "none"}))
+    assert json.loads(lean["body"])["data_used"] is None
+    assert json.loads(full["body"])["response"] == json.loads(lean["body"])["response"]
+    print(f"✅ Inventory answer: {len(full['body'])} bytes with full data_used, {len(lean['body'])} without")
+    
+    print("✅ data_used projection working correctly!\n")
+
+def test_conversation_sessions():
+    """Test follow-ups reuse the previous intent and history stays bounded"""
+    print("🔄 Testing Conversation Sessions...")
+    
+    client = ASGIClient(app)
+    def ask(message, session_id="test-session"):
+        response = asyncio.run(client.post("/chat", {"message": message, "session_id": session_id}))
+        assert response["status"] == 200
+        return json.loads(response["body"])
+    
+    first = ask("How many burgers are left?")
+    assert first["session_id"] == "test-session"
+    assert first["data_used"]["data"]["item_name"] == "Burger"
+    # No intent of its own: stays an inventory question, now about pasta
+    follow_up = ask("And what about pasta?")
+    assert follow_up["data_used"]["query_type"] == "inventory"
+    assert follow_up["data_used"]["data"]["item_name"] == "Pasta"
+    sales = ask("What was the profit last week?")
+    assert ask("what about yesterday?")["data_used"]["data"]["period"] == "yesterday"
+    assert sales["data_used"]["data"]["period"] == "last week"
+    # Questions that stand on their own are not follow-ups, even mid-session
+    ask("How many burgers are left?", "s1")
+    for question in ("How is the restaurant doing?", "Give me a summary of the business"):
+        assert ask(question, "s1")["data_used"]["query_type"] == "overview"
+    assert ask("pasta?", "s1")["data_used"]["query_type"] == "overview"
+    # Without a session the same question has no previous intent to inherit
+    assert asyncio.run(client.post("/chat", {"message": "And what about pasta?"}))["status"] == 200
+    
+    # Streamed turns belong to the conversation too, and shape data_used like /chat
+    def ask_stream(message, **fields):
+        response = asyncio.run(client.post("/chat/stream", {"message": message, "session_id": "stream-session", **fields}))
+        events = [block.split("\n", 1) for block in response["body"].decode().strip().split("\n\n")]
+        return {name[len("event: "):]: json.loads(data[len("data: "):]) for name, data in events if name != "event: delta"}
+    streamed = ask_stream("How many burgers are left?", data_used="none")
+    assert streamed["context"] is None and streamed["done"]["session_id"] == "stream-session"
+    assert ask_stream("And what about pasta?")["context"]["data"]["item_name"] == "Pasta"
+    assert backend.session_store.get("stream-session").turn_count == 2
+    print("✅ Follow-ups inherit the previous intent and swap in the new item or date range")
+    
+    prompts = []
+    backend.llm_client = AsyncLLMClient(FakeGenerativeModel(reply=lambda prompt: prompts.append(prompt) or "ok"))
+    try:
+        for i in range(20):
+            ask(f"Should I restock burgers before the weekend {i}? " + "x" * 400)
+    finally:
+        backend.llm_client = None
+        backend.response_cache.clear()
+    assert "CONVERSATION SO FAR" in prompts[-1]
+    # History is capped, so the prompt stops growing with the conversation
+    assert len(prompts[-1]) == len(prompts[-2])
+    session = backend.session_store.get("test-session")
+    assert len(session.turns) == session.max_turns and session.turn_count == 24
+    assert len(session.summary) == 10 and len(session.history_text(400)) <= 1600
+    assert session.history_text(1000).startswith("Earlier: [inventory] Should I restock burgers before the weekend 4? ")
+    print(f"✅ Prompt size stays at {len(prompts[-1])} chars after {session.turn_count} turns")
+    
+    # Only small contexts are kept for reuse; large ones are rebuilt from the spec
+    spec = ("inventory", None, None, None, None)
+    session.add_turn("Show me all inventory", "ok", spec, {"query_type": "inventory", "data": ["x" * 100] * 100}, 1)
+    assert session.cached_context(spec, 1) is None
+    session.add_turn("Show me all inventory", "ok", spec, {"query_type": "inventory", "data": []}, 1)
+    assert session.cached_context(spec, 1) == {"query_type": "inventory", "data": []}
+    
+    store = SessionStore(max_sessions=2, ttl_seconds=60)
+    store.get("a"), store.get("b"), store.get("a"), store.get("c")
+    assert len(store) == 2 and store.stats()["evicted"] == 1
+    # "b" was the least recently used, so "a" is still there
+    store.get("a")
+    assert store.stats()["created"] == 3
+    store.ttl_seconds = 0
+    store.get("d")
+    assert len(store) == 1 and store.stats()["expired"] == 2
+    assert asyncio.run(client.post("/chat", {"message": "hi", "session_id": ""}))["status"] == 422
+    
+    print("✅ Conversation sessions working correctly!\n")
+
+def test_response_cache():
+    """Test cache keys, LRU eviction and context fingerprints across data changes"""
+    print("🔄 Testing Response Cache...")
+    
+    store = InMemoryStore([{"item_name": "Pizza", "quantity_left": 10, "unit_price": 250}])
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    
+    context = {"query_type": "inventory", "data": store.get_item("pizza").to_dict()}
+    key = cache.make_key("inventory", "How many pizzas are left?", context)
+    assert key == cache.make_key("inventory", "how many  pizzas are left", context)
+    cache.set(key, "10 pizzas left")
+    assert cache.get(key) == "10 pizzas left"
+    
+    # Changed data changes the context fingerprint, so the old answer is never served
+    store.upsert_item("Pizza", 4, 250)
+    changed = {"query_type": "inventory", "data": store.get_item("pizza").to_dict()}
+    assert cache.get(cache.make_key("inventory", "How many pizzas are left?", changed)) is None
+    
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.set("c", "3")
+    assert cache.get("a") is None and cache.get("c") == "3"
+    
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["evictions"] == 2
+    print(f"✅ Cache stats: {stats}")
+    print("✅ Response cache working correctly!\n")
+
+def test_intent_matcher():
+    """Test single-pass intent detection, item extraction and fuzzy matching"""
+    print("🔄 Testing Intent Matcher...")
+    
+    matcher = IntentMatcher({
+        "inventory": ["stock", "left"],
+        "low_stock": ["low", "running"],
+    })
+    matcher.set_catalog(["Burger", "Pizza", "Paneer Tikka"])
+    
+    match = matcher.match("How many Pizzas are left?")
+    assert (match.intent, match.item_name, match.fuzzy) == ("inventory", "Pizza", False)
+    match = matcher.match("paneer tika stock")
+    assert (match.item_name, match.fuzzy) == ("Paneer Tikka", True)
+    assert matcher.match("Which items are running low?").intent == "low_stock"
+    assert matcher.match("hello there").intent == "overview"
+    
+    # New menu items are picked up without rebuilding by hand
+    matcher.add_item("Biryani")
+    assert matcher.match("biryani left").item_name == "Biryani"
+    
+    print("✅ Intent matcher working correctly!\n")
+
+def test_prompt_token_budget():
+    """Test compiled templates and budgeted context serialization"""
+    print("🔄 Testing Prompt Token Budget...")
+    
+    manager = PromptManager(os.path.join(os.path.dirname(__file__), 'backend', 'prompts'),
+                            token_budgets={"sales": 300})
+    sales = [{"date": "2025-09-09", "item_name": "Burger", "quantity_sold": 1, "total_profit": 120}
+             for _ in range(10000)]
+    context = {"query_type": "sales", "data": {"all_sales": sales, "total_profit": 1200000}}
+    
+    rendered = manager.render_prompt("sales", "What's my profit?", context)
+    assert rendered.truncated
+    assert rendered.context_tokens <= 300
+    assert "What's my profit?" in rendered.text
+    assert '"column_totals":{"quantity_sold":10000,"total_profit":1200000}' in rendered.text
+    
+    small = manager.render_prompt("inventory", "Pizza?", {"data": {"item_name": "Pizza"}})
+    assert not small.truncated
+    
+    # Past sampling, whole entries are dropped; the context is always valid JSON
+    wide = {"query_type": "overview", "data": {"notes": "x" * 5000, "profit_by_date": {str(d): d for d in range(500)},
+                                               "total_profit": 1200000}}
+    text, truncated = serialize_context(wide, 100)
+    assert truncated and estimate_tokens(text) <= 100
+    assert json.loads(text) == {"query_type": "overview", "data": {"total_profit": 1200000},
+                                "omitted": ["data.notes", "data.profit_by_date"]}
+    assert parse_token_budgets("sales=4000, overview=1500,") == {"sales": 4000, "overview": 1500}
+    print(f"✅ 10,000 sales rows rendered in {rendered.prompt_bytes} bytes (~{rendered.prompt_tokens} tokens)")
+    print("✅ Prompt token budget working correctly!\n")
+
+def test_prompt_hot_reload():
+    """Test validation on discovery, lazy compiling, atomic reloads and mtime watching of templates"""
+    print("🔄 Testing Prompt Hot Reload...")
+    
+    prompts_dir = tempfile.mkdtemp()
+    def write(name, text, mtime):
+        path = os.path.join(prompts_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.utime(path, (mtime, mtime))
+    write("default.txt", "DEFAULT {query} {context}", 1000)
+    write("inventory.txt", "INVENTORY v1 {query} {context}", 1000)
+    write("broken.txt", "BROKEN {query}", 1000)
+    
+    # Every file is validated when discovered, but compiled only on first use
+    manager = PromptManager(prompts_dir, reload_interval=0.01)
+    assert manager.stats()["loaded"] == []
+    assert manager.validate_prompts() == {"broken": False, "default": True, "inventory": True}
+    assert "missing placeholders" in manager.stats()["errors"]["broken"]
+    first = manager.render_prompt("inventory", "Pizza?", {"data": {}})
+    assert first.text.startswith("INVENTORY v1") and manager.stats()["loaded"] == ["inventory"]
+    
+    # Edits go live on the next check; the version follows the content
+    write("inventory.txt", "INVENTORY v2 {query} {context}", 2000)
+    time.sleep(0.02)
+    second = manager.render_prompt("inventory", "Pizza?", {"data": {}})
+    assert second.text.startswith("INVENTORY v2") and second.template_version != first.template_version
+    assert manager.reloads == 1
+    
+    # An invalid edit is rejected once and the last good version keeps serving
+    write("inventory.txt", "INVENTORY v3 {query}", 3000)
+    time.sleep(0.02)
+    assert manager.get_prompt("inventory").startswith("INVENTORY v2")
+    assert "missing placeholders" in manager.stats()["errors"]["inventory"]
+    
+    write("forecast.txt", "FORECAST {query} {context}", 1000)
+    time.sleep(0.02)
+    manager.get_template("default")
+    assert manager.validate_prompts()["forecast"] and "forecast" not in manager.stats()["loaded"]
+    assert manager.get_prompt("forecast").startswith("FORECAST")
+    assert manager.get_prompt("unknown").startswith("DEFAULT")
+    
+    # Readers never see a half-reloaded manager
+    def render_many():
+        return {manager.get_prompt("inventory").split()[0] for _ in range(5000)}
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        readers = [pool.submit(render_many) for _ in range(4)]
+        for i in range(200):
+            write("inventory.txt", f"INVENTORY v{i + 10} {{query}} {{context}}", 4000 + i)
+            manager.reload_prompts()
+        seen = set().union(*(reader.result() for reader in readers))
+    assert seen == {"INVENTORY"}, seen
+    
+    shipped = PromptManager(reload_interval=0).validate_prompts()
+    assert shipped.keys() >= {"default", "inventory", "sales"} and all(shipped.values())
+    print(f"✅ {manager.reloads} reloads, templates {manager.stats()['versions']}")
+    print("✅ Prompt hot reload working correctly!\n")
+
+def test_fast_path_routing():
+    """Test which queries can be answered without the LLM"""
+    print("🔄 Testing Fast Path Routing...")
+    
+    cases = [
+        ("How many burgers are left?", True),
+        ("What's today's profit?", True),
+        ("Which items are running low?", True),
+        ("Show me all inventory", False),
+        ("What are my best selling items?", False),
+        ("Should I restock burgers?", False),
+    ]
+    for query, expected in cases:
+        context = search_database_context(query)
+        assert is_fact_lookup(query, context) == expected, query
+        print(f"✅ '{query}' -> {'fast path' if expected else 'LLM'}")
+    
+    print("✅ Fast path routing working correctly!\n")
+
+def test_metrics_exposition():
+    """Test Prometheus text rendering of counters, gauges and histograms"""
+    print("🔄 Testing Metrics Exposition...")
+    
+    # Every metric type has to say how it renders
+    try:
+        Metric("untyped_total", "No render")
+        assert False, "expected Metric to be abstract"
+    except TypeError:
+        pass
+    
+    registry = MetricsRegistry()
+    latency = registry.histogram("stage_seconds", "Stage latency", ["stage"], buckets=(0.01, 0.1))
+    errors = registry.counter("errors_total", "Errors", ["stage"])
+    registry.gauge("in_flight", "In flight", callback=lambda: 3)
+    
+    latency.observe(0.005, "search")
+    latency.observe(0.05, "model")
+    latency.observe(5, "model")
+    errors.inc("model")
+    text = registry.render()
+    
+    assert '# TYPE stage_seconds histogram' in text
+    assert 'stage_seconds_bucket{stage="model",le="0.01"} 0' in text
+    assert 'stage_seconds_bucket{stage="model",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="model",le="+Inf"} 2' in text
+    assert 'stage_seconds_count{stage="model"} 2' in text
+    assert 'errors_total{stage="model"} 1' in text
+    assert 'in_flight 3' in text
+    
+    print("✅ Metrics exposition working correctly!\n")
+
+def test_benchmark_harness():
+    """Test the benchmark's synthetic data, percentiles and in-process ASGI driver"""
+    print("🔄 Testing Benchmark Harness...")
+    
+    store = synthetic_store(1000, 20, 7)
+    assert (store.sale_count, store.item_count) == (1000, 20)
+    assert store.sales_on("2025-09-09")
+    
+    assert percentile(list(range(1, 101)), 0.99) == 99
+    stats = summarize([0.001] * 99 + [0.1], 1.0)
+    assert (stats["count"], stats["p50_ms"], stats["max_ms"]) == (100, 1.0, 100.0)
+    
+    response = asyncio.run(ASGIClient(app).post("/chat", {"message": "How many burgers are left?"}))
+    assert response["status"] == 200
+    assert json.loads(response["body"])["path"] == "fast_path"
+    print(f"✅ In-process /chat round trip: {response['seconds'] * 1000:.2f}ms")
+    
+    print("✅ Benchmark harness working correctly!\n")
+
 def test_api_endpoints():
     """Test API endpoint structure"""
     print("🔄 Testing API Endpoint Structure...")
@@ -78,7 +929,26 @@ def main():
     
     try:
         test_database_functions()
+        test_indexed_store()
+        test_sqlite_repository()
+        test_concurrent_sales_and_import()
+        test_sales_date_ranges()
+        test_low_stock_alerts()
         test_mock_llm_response()
+        test_async_llm_client()
+        test_resilient_llm_client()
+        test_streaming_llm_client()
+        test_request_coalescing()
+        test_batch_chat()
+        test_data_used_projection()
+        test_conversation_sessions()
+        test_response_cache()
+        test_intent_matcher()
+        test_prompt_token_budget()
+        test_prompt_hot_reload()
+        test_fast_path_routing()
+        test_metrics_exposition()
+        test_benchmark_harness()
         test_api_endpoints()
         
         print("🎉 ALL TESTS PASSED!")